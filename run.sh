@@ -1,2 +1,2 @@
 #!/bin/bash
-python3 src/main.py
\ No newline at end of file
+python3 src/main.py "$@"
@@ -0,0 +1,220 @@
+from flash.order_book.TradeSink import TRADE_RECORD
+from flash.python_tool_kit.IOToolKit import IOToolKit
+from typing import TypeVar, Iterable, Iterator, Tuple, Dict, List
+import argparse
+import os
+import re
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HM = TypeVar("HM", bound=Dict)
+
+TRADE_FIELDS = ("buyOrderId", "sellOrderId", "price", "quantity")
+NUMBER_PATTERN = re.compile(rb"-?\d+")
+# same layout as 'TradeSink.TRADE_RECORD', binary trade log maps straight onto it
+TRADE_DTYPE = np.dtype([(field, "<i8") for field in TRADE_FIELDS]) if np is not None else None
+
+
+class TradeAnalytics:
+
+    # ------------------
+    # Region: Loading
+    # ------------------
+    @staticmethod
+    def readTradeLog(file_name, trade_format: str = "binary"):
+        """readTradeLog
+        Description
+        -----------
+        Read the whole trade log into structured array with fields buyOrderId, sellOrderId, price, quantity.
+
+        Parameters
+        ----------
+        file_name : str
+            Trade log written by 'TradeSink', or output file of the book, plain or compressed, see 'IOToolKit.openFile'.
+        trade_format : str
+            'binary' - records of 'BinaryTradeSink', read with one 'np.fromfile', or 'np.frombuffer' if compressed,
+            'csv' - 'CsvTradeSink' log with header,
+            'line' - 'LineTradeSink' log or output of the book, lines other than trades are skipped.
+
+        Returns
+        -------
+        np.ndarray
+        """
+        if np is None:
+            raise ImportError("Trade analytics requires numpy.")
+        compressed = IOToolKit.compressionOf(file_name) is not None
+        if trade_format == "binary" and not compressed:
+            return np.fromfile(file_name, dtype=TRADE_DTYPE, count=os.path.getsize(file_name) // TRADE_RECORD.size)
+        with IOToolKit.openFile(file_name, "rb") as f:
+            data = f.read()
+        if trade_format == "binary":
+            return np.frombuffer(data, dtype=TRADE_DTYPE, count=len(data) // TRADE_RECORD.size).copy()
+        if trade_format == "csv":
+            data = data.split(b"\n", 1)[1] if b"\n" in data else b""
+        elif trade_format == "line":
+            data = b"\n".join(line for line in data.splitlines() if line.startswith((b"{'buyOrderId'", b'{"buyOrderId"')))
+        else:
+            raise ValueError("Trade format might be only 'binary', 'csv' or 'line'.")
+        # every trade line holds exactly four numbers in the field order
+        numbers = np.array(NUMBER_PATTERN.findall(data), dtype=np.int64)
+        return TradeAnalytics.fromColumns(numbers.reshape(-1, len(TRADE_FIELDS)))
+
+    @staticmethod
+    def fromTrades(trades: Iterable):
+        """fromTrades
+        Description
+        -----------
+        Structured array from 'Trade' tuples, e.g. transactions of 'OrderBook'.
+        """
+        if np is None:
+            raise ImportError("Trade analytics requires numpy.")
+        return np.array([tuple(trade) for trade in trades], dtype=TRADE_DTYPE)
+
+    @staticmethod
+    def fromColumns(columns):
+        trades = np.empty(len(columns), dtype=TRADE_DTYPE)
+        for i, field in enumerate(TRADE_FIELDS):
+            trades[field] = columns[:, i]
+        return trades
+
+    # ------------------
+    # End Region: Loading
+    # ------------------
+
+    # ------------------
+    # Region: Bars
+    # ------------------
+    @staticmethod
+    def intervalStarts(trades_number: int, bar_size: int = None, keys=None):
+        """intervalStarts
+        Description
+        -----------
+        Index of the first trade of every interval. Trades carry no time, so intervals are
+        either bars of 'bar_size' consecutive trades or runs of equal 'keys', any non decreasing
+        label of trades, e.g. minute of external timestamps.
+        """
+        if keys is not None:
+            keys = np.asarray(keys)
+            if len(keys) != trades_number:
+                raise ValueError("There must be one key per trade.")
+            return np.flatnonzero(np.concatenate(([True], keys[1:] != keys[:-1]))) if trades_number else np.arange(0)
+        if bar_size is None or bar_size <= 0:
+            raise ValueError("Bar size must be positive.")
+        return np.arange(0, trades_number, bar_size)
+
+    @staticmethod
+    def ohlc(trades, bar_size: int = None, keys=None):
+        """ohlc
+        Description
+        -----------
+        Open, high, low, close, traded volume, VWAP and number of trades of every interval, see 'intervalStarts'.
+
+        Parameters
+        ----------
+        trades : np.ndarray
+            Trades in order of execution.
+        bar_size : int
+            Number of trades in one bar.
+        keys : np.ndarray
+            Interval label of every trade, used instead of 'bar_size'.
+
+        Returns
+        -------
+        np.ndarray
+            Structured array with fields start, open, high, low, close, volume, vwap, trades.
+        """
+        starts = TradeAnalytics.intervalStarts(len(trades), bar_size, keys)
+        bars = np.empty(len(starts), dtype=[("start", "<i8"), ("open", "<i8"), ("high", "<i8"), ("low", "<i8"),
+                                            ("close", "<i8"), ("volume", "<i8"), ("vwap", "<f8"), ("trades", "<i8")])
+        if not len(starts):
+            return bars
+        price = trades["price"]
+        quantity = trades["quantity"]
+        ends = np.append(starts[1:], len(trades))
+        bars["start"] = starts
+        bars["open"] = price[starts]
+        bars["close"] = price[ends - 1]
+        bars["high"] = np.maximum.reduceat(price, starts)
+        bars["low"] = np.minimum.reduceat(price, starts)
+        bars["volume"] = np.add.reduceat(quantity, starts)
+        bars["vwap"] = np.add.reduceat(price.astype(np.float64) * quantity, starts) / np.maximum(bars["volume"], 1)
+        bars["trades"] = ends - starts
+        return bars
+
+    @staticmethod
+    def vwap(trades, bar_size: int = None, keys=None):
+        """vwap
+        Description
+        -----------
+        Volume weighted average price of every interval, see 'ohlc'.
+        """
+        return TradeAnalytics.ohlc(trades, bar_size, keys)["vwap"]
+
+    # ------------------
+    # End Region: Bars
+    # ------------------
+
+    @staticmethod
+    def volumePerOrder(trades) -> Tuple:
+        """volumePerOrder
+        Description
+        -----------
+        Traded volume of every order id, both sides of trades counted.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray]
+            Sorted order ids and their traded volume.
+        """
+        ids = np.concatenate((trades["buyOrderId"], trades["sellOrderId"]))
+        quantity = np.concatenate((trades["quantity"], trades["quantity"]))
+        order_ids, inverse = np.unique(ids, return_inverse=True)
+        return order_ids, np.bincount(inverse, weights=quantity, minlength=len(order_ids)).astype(np.int64)
+
+    @staticmethod
+    def depthCurve(book_status: HM, side: str) -> Tuple:
+        """depthCurve
+        Description
+        -----------
+        Depth of one side of the book: volume at every price and cumulative volume from the best price outwards.
+        Volume is taken as published, Iceberg orders count with their visible quantity.
+
+        Parameters
+        ----------
+        book_status : HM
+            Status of the book, {"buyOrders": [...], "sellOrders": [...]}, e.g. 'OrderBook.snapshot()'.
+        side : str
+            'buyOrders' or 'sellOrders'.
+
+        Returns
+        -------
+        Tuple[np.ndarray, np.ndarray, np.ndarray]
+            Prices from the best one, volume at price, cumulative volume.
+        """
+        if side not in ("buyOrders", "sellOrders"):
+            raise ValueError("Side might be only 'buyOrders' or 'sellOrders'.")
+        orders = book_status[side]
+        price = np.fromiter((order["price"] for order in orders), dtype=np.int64, count=len(orders))
+        quantity = np.fromiter((order["quantity"] for order in orders), dtype=np.int64, count=len(orders))
+        prices, inverse = np.unique(price, return_inverse=True)
+        volume = np.bincount(inverse, weights=quantity, minlength=len(prices)).astype(np.int64)
+        if side == "buyOrders":
+            prices, volume = prices[::-1], volume[::-1]
+        return prices, volume, np.cumsum(volume)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="OHLC and VWAP bars of a trade log.")
+    parser.add_argument("trade_log")
+    parser.add_argument("--trade-format", choices=["binary", "csv", "line"], default="binary")
+    parser.add_argument("--bar-size", type=int, default=1000, help="Number of trades in one bar.")
+    args = parser.parse_args()
+
+    trades = TradeAnalytics.readTradeLog(args.trade_log, args.trade_format)
+    bars = TradeAnalytics.ohlc(trades, bar_size=args.bar_size)
+    print(",".join(bars.dtype.names))
+    for bar in bars.tolist():
+        print(",".join(f"{value:.4f}" if isinstance(value, float) else str(value) for value in bar))
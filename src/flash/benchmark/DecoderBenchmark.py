@@ -0,0 +1,134 @@
+from flash.order_book.BinaryOrderStream import BinaryOrderStream
+from flash.order_book.OrderDecoder import OrderDecoder, orjson
+from flash.order_book.OrderProcessing import OrderHandler
+from flash.python_tool_kit.IOToolKit import IOToolKit
+from typing import TypeVar, Iterable, Tuple, Dict, List
+import argparse
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+
+def buildLines(orders_number: int, seed: int = 0) -> List[str]:
+    """buildLines
+    Description
+    -----------
+    Build lines of the order stream in the wire format, mix of Limit and Iceberg orders.
+
+    Parameters
+    ----------
+    orders_number : int
+        Number of lines.
+    seed : int
+        Seed of random generator.
+
+    Returns
+    -------
+    List[str]
+    """
+    rng = random.Random(seed)
+    lines = []
+    for order_id in range(1, orders_number + 1):
+        direction = rng.choice(["Buy", "Sell"])
+        price = rng.randint(90, 110)
+        quantity = rng.randint(1, 1000) * 10
+        if rng.random() < 0.2:
+            lines.append(json.dumps({"type": "Iceberg", "order": {"direction": direction, "id": order_id, "price": price,
+                                                                  "quantity": quantity, "peak": quantity // 5}},
+                                    separators=(",", ":")))
+        else:
+            lines.append(json.dumps({"type": "Limit", "order": {"direction": direction, "id": order_id, "price": price,
+                                                                "quantity": quantity}},
+                                    separators=(",", ":")))
+    return lines
+
+
+def measure(decode, lines: List[str], repeat: int) -> float:
+    """measure
+    Description
+    -----------
+    Best throughput of the decoder over 'repeat' runs.
+
+    Returns
+    -------
+    float
+        Decoded orders per second.
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            decode(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+
+def measureFile(read_orders) -> Tuple[float, int]:
+    """measureFile
+    Description
+    -----------
+    Throughput and peak of traced memory of reading all orders from a file.
+
+    Parameters
+    ----------
+    read_orders : callable
+        Function without arguments that reads all orders and returns their number.
+
+    Returns
+    -------
+    Tuple[float, int]
+        Orders per second, peak memory in bytes.
+    """
+    start = time.perf_counter()
+    orders_number = read_orders()
+    elapsed = time.perf_counter() - start
+    # memory is traced in a separate run, tracing slows allocations down
+    tracemalloc.start()
+    read_orders()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return orders_number / elapsed, peak
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput of order decoders.")
+    parser.add_argument("--orders", type=int, default=200000, help="Number of decoded lines.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of runs, the best one is reported.")
+    args = parser.parse_args()
+
+    lines = buildLines(args.orders)
+    decoders = {
+        "json.loads + OrderHandler": lambda line: OrderHandler(json.loads(line)),
+        "OrderDecoder.decodeWithScanner": OrderDecoder.decodeWithScanner,
+    }
+    if orjson is not None:
+        decoders["orjson.loads + OrderHandler"] = lambda line: OrderHandler(orjson.loads(line))
+        decoders["OrderDecoder.decodeOrder"] = OrderDecoder.decodeOrder
+
+    baseline = None
+    for name, decode in decoders.items():
+        throughput = measure(decode, lines, args.repeat)
+        baseline = baseline or throughput
+        print(f"{name:<30} {throughput:>12,.0f} orders/s  x{throughput / baseline:.2f}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_file = os.path.join(directory, "orders.in")
+        binary_file = os.path.join(directory, "orders.bin")
+        with open(json_file, "w") as f:
+            f.write("\n".join(lines))
+        BinaryOrderStream.convertInputFile(json_file, binary_file)
+
+        readers = {
+            "IOToolKit.parseInputFile": lambda: sum(1 for signal in IOToolKit.parseInputFile(json_file).values()
+                                                    if OrderHandler(signal)),
+            "IOToolKit.streamInputFile": lambda: sum(1 for _ in IOToolKit.streamInputFile(
+                json_file, decoder=OrderDecoder.decodeOrder)),
+            "BinaryOrderStream.replayFile": lambda: sum(1 for _ in BinaryOrderStream.replayFile(binary_file)),
+        }
+        print()
+        for name, read_orders in readers.items():
+            throughput, peak = measureFile(read_orders)
+            print(f"{name:<30} {throughput:>12,.0f} orders/s  peak memory {peak / 2**20:8.2f} MiB")
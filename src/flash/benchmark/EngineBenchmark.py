@@ -0,0 +1,158 @@
+from flash.benchmark.OrderFlowGenerator import OrderFlowGenerator, SUBMIT, CANCEL
+from flash.order_book.BookSides import BOOK_SIDES
+from flash.order_book.OrderProcessing import OrderBook
+from flash.order_book.OutputWriter import OutputWriter
+from flash.order_book.TradeSink import NullTradeSink
+from typing import TypeVar, Iterable, Tuple, Dict, List
+from array import array
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+HM = TypeVar("HM", bound=Dict)
+
+PERCENTILES = (50, 90, 99, 99.9)
+
+
+def buildBook(book_type: str) -> OrderBook:
+    # neither output nor the list of transactions grows during the benchmark
+    return OrderBook(book_type=book_type, output=OutputWriter(),
+                     trade_sink=NullTradeSink(batch_size=4096, flush_stream=False))
+
+
+def drive(book: OrderBook, events: Iterable[Tuple], latencies: array = None) -> Tuple[int, int, int]:
+    """drive
+    Description
+    -----------
+    Feed the book with events of 'OrderFlowGenerator'. Cancels and amends of orders that are
+    no longer in the book are skipped.
+
+    Parameters
+    ----------
+    book : OrderBook
+        Book under test.
+    events : Iterable[Tuple]
+        Events of the flow.
+    latencies : array
+        If given then latency of every event in nanoseconds is appended.
+
+    Returns
+    -------
+    Tuple[int, int, int]
+        Number of processed events, skipped events and trades.
+    """
+    clock = time.perf_counter_ns
+    processed = skipped = trades = 0
+    for event in events:
+        kind = event[0]
+        if kind != SUBMIT and book.findOrder(event[1]) is None:
+            skipped += 1
+            continue
+        start = clock()
+        if kind == SUBMIT:
+            trades += len(book.submit(event[1]))
+        elif kind == CANCEL:
+            book.cancel(event[1])
+        else:
+            book.amend(event[1], event[2])
+        if latencies is not None:
+            latencies.append(clock() - start)
+        processed += 1
+    return processed, skipped, trades
+
+
+def percentile(sorted_values: array, q: float) -> int:
+    """percentile
+    Description
+    -----------
+    Nearest rank percentile of sorted values.
+    """
+    if not sorted_values:
+        return 0
+    return sorted_values[min(int(len(sorted_values) * q / 100), len(sorted_values) - 1)]
+
+
+def runBenchmark(events_number: int, book_type: str = "price_level", seed: int = 0, depth: int = 50,
+                 trace_memory: bool = True) -> HM:
+    """runBenchmark
+    Description
+    -----------
+    Run the engine against seeded synthetic flow. Throughput and latency are measured in the first
+    run, allocations in the second run with the same flow, because tracing slows allocations down.
+
+    Parameters
+    ----------
+    events_number : int
+        Number of events of the flow.
+    book_type : str
+        Backend of the book, see 'BOOK_SIDES'.
+    seed : int
+        Seed of the flow.
+    depth : int
+        Depth of the book in ticks, see 'OrderFlowGenerator'.
+    trace_memory : bool
+        If True then allocations are measured in the second run.
+
+    Returns
+    -------
+    HM
+        Measures of the run.
+    """
+    latencies = array("q")
+    processed, skipped, trades = drive(buildBook(book_type), OrderFlowGenerator(seed=seed, depth=depth).events(events_number),
+                                       latencies)
+    busy = sum(latencies)
+    sorted_latencies = array("q", sorted(latencies))
+    del latencies
+    report = {"book_type": book_type, "events": events_number, "processed": processed, "skipped": skipped,
+              "trades": trades, "orders_per_second": processed / busy * 1e9 if busy else 0.0,
+              "latency_ns": {f"p{q:g}": percentile(sorted_latencies, q) for q in PERCENTILES},
+              "peak_rss_mib": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024}
+    report["latency_ns"]["max"] = sorted_latencies[-1] if sorted_latencies else 0
+    del sorted_latencies
+    if trace_memory:
+        tracemalloc.start()
+        blocks = sys.getallocatedblocks()
+        book = buildBook(book_type)
+        drive(book, OrderFlowGenerator(seed=seed, depth=depth).events(events_number))
+        report["traced_peak_mib"] = tracemalloc.get_traced_memory()[1] / 2**20
+        report["live_blocks"] = sys.getallocatedblocks() - blocks
+        tracemalloc.stop()
+    return report
+
+
+def printReport(report: HM) -> None:
+    latency = "  ".join(f"{name} {value / 1000:8.2f}us" for name, value in report["latency_ns"].items())
+    memory = f"  traced peak {report['traced_peak_mib']:8.2f} MiB" if "traced_peak_mib" in report else ""
+    print(f"{report['book_type']:<12} {report['events']:>10,} events {report['orders_per_second']:>12,.0f} orders/s  "
+          f"{latency}  peak RSS {report['peak_rss_mib']:8.2f} MiB{memory}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput, latency and memory of the matching engine.")
+    parser.add_argument("--orders", type=int, nargs="+", default=[10**3, 10**4, 10**5, 10**6],
+                        help="Numbers of events, every size is run in a separate process so peak RSS is not shared.")
+    parser.add_argument("--book-type", choices=sorted(BOOK_SIDES), nargs="+", default=["price_level"])
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--depth", type=int, default=50, help="Maximal distance of passive orders from the mid, in ticks.")
+    parser.add_argument("--no-trace", action="store_true", help="Skip the run that traces allocations.")
+    parser.add_argument("--json", action="store_true", help="Print reports as json, one per line.")
+    args = parser.parse_args()
+
+    if len(args.orders) == 1 and len(args.book_type) == 1:
+        report = runBenchmark(args.orders[0], book_type=args.book_type[0], seed=args.seed,
+                              depth=args.depth, trace_memory=not args.no_trace)
+        print(json.dumps(report)) if args.json else printReport(report)
+    else:
+        for book_type in args.book_type:
+            for events_number in args.orders:
+                command = [sys.executable, "-m", "flash.benchmark.EngineBenchmark", "--orders", str(events_number),
+                           "--book-type", book_type, "--seed", str(args.seed), "--depth", str(args.depth), "--json"]
+                if args.no_trace:
+                    command.append("--no-trace")
+                report = json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout)
+                print(json.dumps(report)) if args.json else printReport(report)
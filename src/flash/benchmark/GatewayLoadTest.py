@@ -0,0 +1,118 @@
+from flash.benchmark.OrderFlowGenerator import OrderFlowGenerator
+from flash.benchmark.EngineBenchmark import percentile
+from flash.order_book.OrderGateway import OrderGateway
+from typing import TypeVar, Iterable, Tuple, Dict, List
+from array import array
+import argparse
+import asyncio
+import json
+import os
+import tempfile
+import time
+
+HM = TypeVar("HM", bound=Dict)
+
+
+def buildClientLines(clients: int, orders_number: int, seed: int = 0) -> List[List[bytes]]:
+    """buildClientLines
+    Description
+    -----------
+    Split seeded flow of new orders between clients, ids stay unique across clients.
+    """
+    generator = OrderFlowGenerator(seed=seed)
+    lines = [[] for _ in range(clients)]
+    for i in range(orders_number):
+        order = generator.newOrder()
+        body = {"direction": order.direction, "id": order.id, "price": order.price, "quantity": order.quantity}
+        if order.peak is not None:
+            body["peak"] = order.peak
+        lines[i % clients].append(json.dumps({"type": order.type, "order": body}, separators=(",", ":")).encode()
+                                  + b"\n")
+    return lines
+
+
+async def runClient(open_connection, lines: List[bytes], latencies: array) -> Tuple[int, int]:
+    """runClient
+    Description
+    -----------
+    Send all orders at once and read answers until every order is acked or rejected.
+    Latency of an order is the time from writing its line to reading its ack.
+
+    Returns
+    -------
+    Tuple[int, int]
+        Number of acks and fills received.
+    """
+    reader, writer = await open_connection()
+    clock = time.perf_counter_ns
+    sent = {}
+
+    async def send() -> None:
+        for line in lines:
+            sent[json.loads(line)["order"]["id"]] = clock()
+            writer.write(line)
+            # backpressure of the gateway stops the client here
+            await writer.drain()
+        writer.write_eof()
+
+    sender = asyncio.get_running_loop().create_task(send())
+    answered = acks = fills = 0
+    while answered < len(lines):
+        line = await reader.readline()
+        if not line:
+            break
+        message = json.loads(line)
+        if message["event"] == "fill":
+            fills += 1
+            continue
+        answered += 1
+        if message["event"] == "ack":
+            acks += 1
+            latencies.append(clock() - sent[message["id"]])
+    await sender
+    writer.close()
+    return acks, fills
+
+
+async def runLoadTest(clients: int, orders_number: int, queue_size: int, unix: bool, seed: int = 0) -> HM:
+    """runLoadTest
+    Description
+    -----------
+    Start gateway in this process and drive it with 'clients' concurrent connections.
+
+    Returns
+    -------
+    HM
+        Measures of the run.
+    """
+    client_lines = buildClientLines(clients, orders_number, seed=seed)
+    gateway = OrderGateway(queue_size=queue_size)
+    with tempfile.TemporaryDirectory() as directory:
+        if unix:
+            path = os.path.join(directory, "gateway.sock")
+            await gateway.start(path=path)
+            open_connection = lambda: asyncio.open_unix_connection(path)
+        else:
+            await gateway.start(host="127.0.0.1", port=0)
+            port = gateway.sockets()[0].getsockname()[1]
+            open_connection = lambda: asyncio.open_connection("127.0.0.1", port)
+        latencies = array("q")
+        start = time.perf_counter()
+        results = await asyncio.gather(*(runClient(open_connection, lines, latencies) for lines in client_lines))
+        elapsed = time.perf_counter() - start
+        await gateway.stop()
+    latencies = array("q", sorted(latencies))
+    return {"clients": clients, "orders": orders_number, "acks": sum(acks for acks, _ in results),
+            "fills": sum(fills for _, fills in results), "orders_per_second": orders_number / elapsed,
+            "ack_latency_us": {f"p{q:g}": percentile(latencies, q) / 1000 for q in (50, 90, 99, 99.9)}}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load test of the order gateway on local socket.")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--orders", type=int, default=100000)
+    parser.add_argument("--queue-size", type=int, default=10000)
+    parser.add_argument("--tcp", action="store_true", help="Use TCP on localhost instead of unix socket.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(runLoadTest(args.clients, args.orders, args.queue_size, not args.tcp, args.seed))))
@@ -0,0 +1,163 @@
+from flash.order_book.OrderProcessing import OrderHandler
+from flash.python_tool_kit.IOToolKit import IOToolKit
+from typing import TypeVar, Iterable, Iterator, Tuple, Dict, List
+from collections import deque
+import json
+import random
+import sys
+
+HM = TypeVar("HM", bound=Dict)
+
+SUBMIT = "submit"
+CANCEL = "cancel"
+AMEND = "amend"
+
+
+class OrderFlowGenerator:
+
+    def __init__(self, seed: int = 0, start_price: int = 10000, depth: int = 50, volatility: float = 0.3,
+                 iceberg_ratio: float = 0.1, marketable_ratio: float = 0.2, cancel_ratio: float = 0.25,
+                 amend_ratio: float = 0.1, lot: int = 10) -> None:
+        """__init__
+        Description
+        -----------
+        Seeded source of synthetic order flow. Mid price follows a random walk, passive orders
+        rest up to 'depth' ticks away from the mid, marketable orders cross it and trade.
+        Part of the flow are cancels and amends of orders submitted earlier. The same seed
+        always gives the same flow.
+
+        Parameters
+        ----------
+        seed : int
+            Seed of random generator.
+        start_price : int
+            Initial mid price in ticks.
+        depth : int
+            Maximal distance of passive order from the mid, in ticks.
+        volatility : float
+            Probability that the mid moves by one tick before the next event.
+        iceberg_ratio : float
+            Share of Iceberg orders among new orders.
+        marketable_ratio : float
+            Share of new orders priced through the mid.
+        cancel_ratio : float
+            Share of cancels among all events.
+        amend_ratio : float
+            Share of amends among all events.
+        lot : int
+            Quantities are multiples of the lot.
+        """
+        if depth <= 0 or start_price <= depth:
+            raise ValueError("Depth must be positive and smaller than start price.")
+        if cancel_ratio + amend_ratio >= 1:
+            raise ValueError("Cancels and amends cannot make the whole flow.")
+        self._rng = random.Random(seed)
+        self._mid = start_price
+        self._depth = depth
+        self._volatility = volatility
+        self._iceberg_ratio = iceberg_ratio
+        self._marketable_ratio = marketable_ratio
+        self._cancel_ratio = cancel_ratio
+        self._amend_ratio = amend_ratio
+        self._lot = lot
+        self._next_id = 1
+        # ids of recently submitted passive orders, candidates for cancels and amends
+        self._recent = deque(maxlen=depth * 20)
+
+    # ------------------
+    # Region: Events
+    # ------------------
+    def newOrder(self) -> OrderHandler:
+        """newOrder
+        Description
+        -----------
+        Draw new Limit or Iceberg order around the current mid.
+
+        Returns
+        -------
+        OrderHandler
+        """
+        rng = self._rng
+        if rng.random() < self._volatility:
+            self._mid = max(self._mid + rng.choice((-1, 1)), self._depth + 1)
+        direction = "Buy" if rng.random() < 0.5 else "Sell"
+        side = 1 if direction == "Buy" else -1
+        marketable = rng.random() < self._marketable_ratio
+        if marketable:
+            price = self._mid + side * rng.randint(0, 2)
+        else:
+            # passive orders cluster close to the mid
+            price = self._mid - side * min(int(rng.expovariate(4 / self._depth)) + 1, self._depth)
+        order_id = self._next_id
+        self._next_id += 1
+        if rng.random() < self._iceberg_ratio:
+            quantity = rng.randint(10, 200) * self._lot
+            order = OrderHandler.fromFields("Iceberg", direction, order_id, price, quantity,
+                                            max(quantity // rng.randint(5, 20), 1))
+        else:
+            order = OrderHandler.fromFields("Limit", direction, order_id, price, rng.randint(1, 100) * self._lot)
+        if not marketable:
+            self._recent.append(order_id)
+        return order
+
+    def nextEvent(self) -> Tuple:
+        """nextEvent
+        Description
+        -----------
+        Draw next event of the flow.
+
+        Returns
+        -------
+        Tuple
+            (SUBMIT, OrderHandler), (CANCEL, id) or (AMEND, id, quantity). Cancelled and amended
+            orders might have already been filled, the consumer has to check it.
+        """
+        rng = self._rng
+        draw = rng.random()
+        if self._recent and draw < self._cancel_ratio:
+            return CANCEL, self._recent.popleft() if rng.random() < 0.5 else self._recent.pop()
+        if self._recent and draw < self._cancel_ratio + self._amend_ratio:
+            return AMEND, self._recent[rng.randrange(len(self._recent))], rng.randint(1, 100) * self._lot
+        return SUBMIT, self.newOrder()
+
+    def events(self, events_number: int) -> Iterator[Tuple]:
+        """events
+        Description
+        -----------
+        Lazy stream of 'events_number' events, see 'nextEvent'.
+        """
+        next_event = self.nextEvent
+        for _ in range(events_number):
+            yield next_event()
+
+    # ------------------
+    # End Region: Events
+    # ------------------
+
+    def writeStream(self, file_name, orders_number: int) -> None:
+        """writeStream
+        Description
+        -----------
+        Write 'orders_number' new orders in the input format, one json per line. Input format
+        has no cancels nor amends, so only new orders are written.
+
+        Parameters
+        ----------
+        file_name : str
+            Path to the output file, compressed if it ends with '.gz', '.xz' or '.bz2'.
+        orders_number : int
+            Number of orders.
+        """
+        with IOToolKit.openFile(file_name, "w") as f:
+            for _ in range(orders_number):
+                order = self.newOrder()
+                body = {"direction": order.direction, "id": order.id, "price": order.price, "quantity": order.quantity}
+                if order.peak is not None:
+                    body["peak"] = order.peak
+                f.write(json.dumps({"type": order.type, "order": body}, separators=(",", ":")) + "\n")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (3, 4):
+        sys.exit("usage: python -m flash.benchmark.OrderFlowGenerator ORDERS OUTPUT.in[.gz|.xz|.bz2] [SEED]")
+    OrderFlowGenerator(seed=int(sys.argv[3]) if len(sys.argv) == 4 else 0).writeStream(sys.argv[2], int(sys.argv[1]))
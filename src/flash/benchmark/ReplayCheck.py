@@ -0,0 +1,311 @@
+from flash.benchmark.OrderFlowGenerator import OrderFlowGenerator, SUBMIT, CANCEL
+from flash.order_book.BookSides import BOOK_SIDES
+from flash.order_book.OrderDecoder import OrderDecoder
+from flash.order_book.OrderProcessing import OrderBook
+from flash.order_book.OutputWriter import DeltaWriter, SnapshotWriter
+from flash.python_tool_kit.IOToolKit import IOToolKit, COMPRESSIONS
+from typing import TypeVar, Iterable, Iterator, Tuple, Dict, List
+import argparse
+import ast
+import glob
+import hashlib
+import io
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+HM = TypeVar("HM", bound=Dict)
+
+IO_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "..", "io")
+STREAM_DIRECTORY = os.path.join(IO_DIRECTORY, "STREAM_FILES")
+GOLDEN_FILE = os.path.join(IO_DIRECTORY, "GOLDEN_FILES", "replay.json")
+EXPECTED_DIRECTORY = os.path.join(IO_DIRECTORY, "OUTPUT_FILES")
+
+
+class DigestWriter(DeltaWriter):
+    """DigestWriter
+    Description
+    -----------
+    Canonical output of the book reduced to a hash. Records of 'DeltaWriter', an end marker of every
+    event and rejected orders are hashed as they happen, nothing is kept in memory.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._digest = hashlib.sha256()
+        self.records = 0
+        self.trades = 0
+
+    def write(self, record) -> None:
+        self._digest.update(f"{record}\n".encode())
+        self.records += 1
+
+    def tradeMade(self, trade) -> None:
+        self.trades += 1
+        super().tradeMade(trade)
+
+    def eventProcessed(self, order_book) -> None:
+        self.write({"event": "end"})
+
+    def orderRejected(self, row: int, reason: str) -> None:
+        self.write({"event": "reject", "row": row, "reason": reason})
+
+    def close(self, order_book, transactions: List) -> None:
+        pass
+
+    def hexdigest(self) -> str:
+        return self._digest.hexdigest()
+
+
+# ------------------
+# Region: Streams
+# ------------------
+def fileEvents(file_name) -> Iterator[Tuple]:
+    """fileEvents
+    Description
+    -----------
+    Orders of a stream file as events of 'OrderFlowGenerator', lines that cannot be decoded are
+    passed on as their error message.
+    """
+    with IOToolKit.openFile(file_name) as f:
+        for line in f:
+            if line.strip():
+                try:
+                    yield SUBMIT, OrderDecoder.decodeOrder(line)
+                except (ValueError, KeyError, TypeError) as e:
+                    yield SUBMIT, f"Cannot decode order: {e}"
+
+
+def streamSources(stream_directory, generated: List[int], seed: int = 0) -> Dict:
+    """streamSources
+    Description
+    -----------
+    Name of every stream with a function that gives its events from the start, so the same stream
+    can be replayed more than once. Generated streams are named 'generated-<events>-seed<seed>'.
+    """
+    sources = {}
+    patterns = ["*.in"] + ["*.in" + compression for compression in COMPRESSIONS]
+    for file_name in sorted(match for pattern in patterns for match in glob.glob(os.path.join(stream_directory, pattern))):
+        sources[os.path.basename(file_name)] = lambda file_name=file_name: fileEvents(file_name)
+    for events_number in generated:
+        sources[f"generated-{events_number}-seed{seed}"] = \
+            lambda events_number=events_number: OrderFlowGenerator(seed=seed).events(events_number)
+    return sources
+
+# ------------------
+# End Region: Streams
+# ------------------
+
+
+def replay(events: Iterable[Tuple], book_type: str = "price_level") -> DigestWriter:
+    """replay
+    Description
+    -----------
+    Pass events through a new book and hash everything it publishes. Rejected orders are hashed
+    with their reason and do not stop the replay, cancels and amends of orders that are no longer
+    in the book are skipped as in 'EngineBenchmark.drive'. Final status of the book is hashed at the end.
+
+    Returns
+    -------
+    DigestWriter
+        Hash and counters of the replay.
+    """
+    writer = DigestWriter()
+    book = OrderBook(book_type=book_type, output=writer)
+    for row, event in enumerate(events, 1):
+        kind = event[0]
+        if kind == SUBMIT:
+            try:
+                if isinstance(event[1], str):
+                    raise ValueError(event[1])
+                book.submit(event[1])
+            except ValueError as e:
+                writer.orderRejected(row, str(e))
+        elif book.findOrder(event[1]) is not None:
+            if kind == CANCEL:
+                book.cancel(event[1])
+            else:
+                book.amend(event[1], event[2])
+    writer.write(book.snapshot())
+    return writer
+
+
+def checkStream(source, book_type: str = "price_level", trace_memory: bool = True) -> HM:
+    """checkStream
+    Description
+    -----------
+    Hash, wall time and, if 'trace_memory', traced peak of memory of the replay of one stream.
+    Memory is measured in a second run, because tracing slows allocations down.
+    """
+    start = time.perf_counter()
+    writer = replay(source(), book_type)
+    result = {"digest": writer.hexdigest(), "records": writer.records, "trades": writer.trades,
+              "wall_time_s": time.perf_counter() - start}
+    if trace_memory:
+        tracemalloc.start()
+        replay(source(), book_type)
+        result["traced_peak_mib"] = tracemalloc.get_traced_memory()[1] / 2**20
+        tracemalloc.stop()
+    return result
+
+
+def checkGoldens(sources: Dict, goldens: HM, book_type: str = "price_level", trace_memory: bool = True) -> List[HM]:
+    """checkGoldens
+    Description
+    -----------
+    Replay every stream and compare it with its golden. Time and memory of the golden run are reported
+    next to the current ones, so one run tells if a change of the engine is both correct and faster.
+
+    Parameters
+    ----------
+    sources : Dict
+        Streams, see 'streamSources'.
+    goldens : HM
+        Goldens of 'book_type', {stream name: result of 'checkStream'}.
+    book_type : str
+        Backend of the book, see 'BOOK_SIDES'.
+    trace_memory : bool
+        If True then traced peak of memory is measured.
+
+    Returns
+    -------
+    List[HM]
+        Result of every stream with its status: 'ok', 'changed' or 'new' if there is no golden.
+    """
+    results = []
+    for name, source in sources.items():
+        result = {"stream": name, **checkStream(source, book_type, trace_memory)}
+        golden = goldens.get(name)
+        if golden is None:
+            result["status"] = "new"
+        else:
+            result["status"] = "ok" if golden["digest"] == result["digest"] else "changed"
+            result["golden_wall_time_s"] = golden["wall_time_s"]
+            if "traced_peak_mib" in golden:
+                result["golden_traced_peak_mib"] = golden["traced_peak_mib"]
+        results.append(result)
+    return results
+
+
+# ------------------
+# Region: Expected outputs
+# ------------------
+def parseRecord(line: str):
+    """parseRecord
+    Description
+    -----------
+    Record of an output line, written either as json or as python literal by 'OutputWriter'.
+    """
+    try:
+        return json.loads(line)
+    except ValueError:
+        return ast.literal_eval(line)
+
+
+def legacyOutput(file_name, book_type: str = "price_level") -> List:
+    """legacyOutput
+    Description
+    -----------
+    Records written by the book in legacy mode, see 'SnapshotWriter', as in a run of 'main.py'.
+    Invalid order stops the stream, its error is the last record.
+    """
+    stream = io.StringIO()
+    try:
+        OrderBook(incoming_orders=IOToolKit.streamInputFile(file_name), book_type=book_type,
+                  output=SnapshotWriter(stream=stream))
+        error = None
+    except (ValueError, KeyError, TypeError) as e:
+        error = {"error": f"{type(e).__name__}: {e}"}
+    records = [parseRecord(line) for line in stream.getvalue().splitlines()]
+    return records + [error] if error is not None else records
+
+
+def checkExpectedOutputs(stream_directory, expected_directory, book_type: str = "price_level") -> List[HM]:
+    """checkExpectedOutputs
+    Description
+    -----------
+    Compare legacy output of every stream that has hand-written expected output 'name.out' in 'expected_directory'
+    with it, record by record. Unlike goldens, expected outputs are the specification of the engine, they are never
+    updated by this check.
+
+    Returns
+    -------
+    List[HM]
+        Result of every stream with its status: 'ok' or 'differs' with the first differing line.
+    """
+    results = []
+    for expected_file in sorted(glob.glob(os.path.join(expected_directory, "*.out"))):
+        name = os.path.splitext(os.path.basename(expected_file))[0]
+        streams = [os.path.join(stream_directory, name + ".in" + compression) for compression in ("",) + tuple(COMPRESSIONS)]
+        stream_file = next((file_name for file_name in streams if os.path.isfile(file_name)), None)
+        if stream_file is None:
+            continue
+        with IOToolKit.openFile(expected_file) as f:
+            expected = [parseRecord(line) for line in f if line.strip()]
+        actual = legacyOutput(stream_file, book_type)
+        result = {"stream": os.path.basename(stream_file), "expected": os.path.basename(expected_file),
+                  "records": len(actual), "status": "ok" if actual == expected else "differs"}
+        if actual != expected:
+            line = next((i for i, (a, e) in enumerate(zip(actual, expected)) if a != e), min(len(actual), len(expected)))
+            result.update({"line": line + 1, "expected_record": expected[line] if line < len(expected) else None,
+                           "actual_record": actual[line] if line < len(actual) else None})
+        results.append(result)
+    return results
+
+# ------------------
+# End Region: Expected outputs
+# ------------------
+
+
+def printResult(result: HM) -> None:
+    if "expected" in result:
+        print(f"{result['status']:<8} {result['stream']:<32} {result['records']:>10,} records against {result['expected']}")
+        if result["status"] != "ok":
+            print(f"         line {result['line']}: expected {result['expected_record']}, got {result['actual_record']}")
+        return
+    speed = f"  x{result['golden_wall_time_s'] / result['wall_time_s']:5.2f} of golden" \
+        if "golden_wall_time_s" in result and result["wall_time_s"] else ""
+    memory = f"  traced peak {result['traced_peak_mib']:8.2f} MiB" if "traced_peak_mib" in result else ""
+    print(f"{result['status']:<8} {result['stream']:<32} {result['records']:>10,} records {result['trades']:>9,} trades "
+          f"{result['wall_time_s']:9.3f}s{speed}{memory}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay streams through the book and compare hashed output with goldens.")
+    parser.add_argument("--streams", default=STREAM_DIRECTORY, help="Directory with *.in streams, also compressed *.in.gz, *.in.xz, *.in.bz2.")
+    parser.add_argument("--generated", type=int, nargs="*", default=[100000],
+                        help="Sizes of generated streams replayed next to the files.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of generated streams.")
+    parser.add_argument("--book-type", choices=sorted(BOOK_SIDES), default="price_level")
+    parser.add_argument("--golden-file", default=GOLDEN_FILE)
+    parser.add_argument("--update", action="store_true", help="Store results of this run as goldens.")
+    parser.add_argument("--no-trace", action="store_true", help="Skip the run that traces memory.")
+    parser.add_argument("--expected", default=EXPECTED_DIRECTORY,
+                        help="Directory with hand-written expected legacy outputs <stream name>.out.")
+    parser.add_argument("--json", action="store_true", help="Print results as json, one per line.")
+    args = parser.parse_args()
+
+    goldens = {}
+    if os.path.exists(args.golden_file):
+        with open(args.golden_file) as f:
+            goldens = json.load(f)
+    results = checkGoldens(streamSources(args.streams, args.generated, args.seed), goldens.get(args.book_type, {}),
+                           book_type=args.book_type, trace_memory=not args.no_trace)
+    expected_results = checkExpectedOutputs(args.streams, args.expected, book_type=args.book_type)
+    for result in results + expected_results:
+        print(json.dumps(result)) if args.json else printResult(result)
+
+    if args.update:
+        goldens.setdefault(args.book_type, {}).update(
+            {result["stream"]: {key: value for key, value in result.items()
+                                if key in ("digest", "records", "trades", "wall_time_s", "traced_peak_mib")}
+             for result in results})
+        os.makedirs(os.path.dirname(args.golden_file), exist_ok=True)
+        with open(args.golden_file, "w") as f:
+            json.dump(goldens, f, indent=2, sort_keys=True)
+            f.write("\n")
+    # stream without golden is reported as 'new' and stored by '--update', it is not a failure
+    if any(result["status"] not in ("ok", "new") for result in (expected_results if args.update else results + expected_results)):
+        sys.exit(1)
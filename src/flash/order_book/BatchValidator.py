@@ -0,0 +1,187 @@
+from flash.order_book.OrderProcessing import OrderBook, OrderHandler, Trade
+from typing import TypeVar, Iterable, Iterator, Tuple, Dict, List, NamedTuple
+import itertools
+import json
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HM = TypeVar("HM", bound=Dict)
+
+TYPE_CODES = {"Limit": 0, "Iceberg": 1}
+DIRECTION_CODES = {"Buy": 0, "Sell": 1}
+TYPES = ("Limit", "Iceberg")
+DIRECTIONS = ("Buy", "Sell")
+# reasons in the order of checks of 'OrderBook.validateQuery'
+REASONS = ("Type of order might be only 'Iceberg' and 'Limit'.",
+           "Price cannot be negative!",
+           "Quantity value cannot be negative!",
+           "Direction might be only 'Buy' or 'Sell'",
+           "Peak of Iceberg order must be positive.")
+
+
+class InvalidRow(NamedTuple):
+    row: int
+    id: int
+    reason: str
+
+
+class OrderBatch:
+
+    __slots__ = ("rows", "types", "directions", "ids", "prices", "quantities", "peaks", "rejected")
+
+    def __init__(self, lines: Iterable[str], first_row: int = 1) -> None:
+        """__init__
+        Description
+        -----------
+        Chunk of the order stream kept as columns. Every line is decoded once, unknown type and
+        direction are coded as -1, so they are rejected by 'BatchValidator.validate' with the rest.
+        Lines that are not orders at all are rejected here.
+
+        Parameters
+        ----------
+        lines : Iterable[str]
+            Orders in the input format, one json per line.
+        first_row : int
+            Number of the first line in the stream, rows are counted from 1.
+        """
+        if np is None:
+            raise ImportError("Batch validation requires numpy.")
+        loads = orjson.loads if orjson is not None else json.loads
+        records = []
+        self.rejected = []
+        for row, line in enumerate(lines, first_row):
+            if not line.strip():
+                continue
+            try:
+                signal = loads(line)
+                order = signal["order"]
+                type_ = TYPE_CODES.get(signal["type"], -1)
+                record = (row, type_, DIRECTION_CODES.get(order["direction"], -1), order["id"], order["price"],
+                          order["quantity"], order["peak"] if type_ == 1 else 1)
+                if not all(type(value) is int and -2**63 <= value < 2**63 for value in record[3:]):
+                    raise TypeError("id, price, quantity and peak must be 64 bit integers")
+            except (ValueError, KeyError, TypeError) as e:
+                self.rejected.append(InvalidRow(row, None, f"Cannot decode order: {e}"))
+                continue
+            records.append(record)
+        columns = np.array(records, dtype=np.int64).reshape(-1, 7)
+        (self.rows, self.types, self.directions, self.ids, self.prices,
+         self.quantities, self.peaks) = columns.T
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+
+class BatchValidator:
+
+    @staticmethod
+    def readBatches(lines: Iterable[str], batch_size: int = 65536) -> Iterator[OrderBatch]:
+        """readBatches
+        Description
+        -----------
+        Cut stream of lines into batches of 'batch_size' lines. Rows are numbered by position in 'lines', so blank
+        lines must be kept to report line numbers of the file, e.g. 'IOToolKit.streamInputFile(file, decoder=str, blank_lines=True)'.
+        """
+        if batch_size <= 0:
+            raise ValueError("Batch size must be positive.")
+        iterator = iter(lines)
+        first_row = 1
+        while True:
+            chunk = list(itertools.islice(iterator, batch_size))
+            if not chunk:
+                return
+            yield OrderBatch(chunk, first_row)
+            first_row += len(chunk)
+
+    @staticmethod
+    def validate(batch: OrderBatch) -> Tuple:
+        """validate
+        Description
+        -----------
+        Check all orders of the batch at once, with the same rules as 'OrderBook.validateQuery'
+        except the id and price band checks, which depend on the book.
+
+        Parameters
+        ----------
+        batch : OrderBatch
+
+        Returns
+        -------
+        Tuple[np.ndarray, List[InvalidRow]]
+            Mask of valid orders and every invalid order with the first rule it breaks,
+            orders rejected while decoding included.
+        """
+        failures = np.stack([batch.types < 0,
+                             batch.prices < 0,
+                             batch.quantities < 0,
+                             batch.directions < 0,
+                             (batch.types == 1) & (batch.peaks <= 0)])
+        invalid = failures.any(axis=0)
+        invalid_rows = [InvalidRow(row, id_, REASONS[reason]) for row, id_, reason in
+                        zip(batch.rows[invalid].tolist(), batch.ids[invalid].tolist(),
+                            failures[:, invalid].argmax(axis=0).tolist())]
+        if batch.rejected:
+            invalid_rows = sorted(batch.rejected + invalid_rows)
+        return ~invalid, invalid_rows
+
+    @staticmethod
+    def submitBatch(order_book: OrderBook, batch: OrderBatch) -> Tuple[List[Trade], List[InvalidRow]]:
+        """submitBatch
+        Description
+        -----------
+        Validate the batch and pass its valid orders to the book in stream order. Orders rejected by
+        the book itself, e.g. with id of resting order, are reported as well and do not stop the batch.
+
+        Parameters
+        ----------
+        order_book : OrderBook
+            Book fed with the batch.
+        batch : OrderBatch
+
+        Returns
+        -------
+        Tuple[List[Trade], List[InvalidRow]]
+            Trades made by the batch and all invalid orders.
+        """
+        valid, invalid_rows = BatchValidator.validate(batch)
+        trades = []
+        rejected_by_book = []
+        from_fields = OrderHandler.fromFields
+        submit = order_book.submit
+        columns = (batch.rows[valid].tolist(), batch.types[valid].tolist(), batch.directions[valid].tolist(),
+                   batch.ids[valid].tolist(), batch.prices[valid].tolist(), batch.quantities[valid].tolist(),
+                   batch.peaks[valid].tolist())
+        for row, type_, direction, id_, price, quantity, peak in zip(*columns):
+            try:
+                trades.extend(submit(from_fields(TYPES[type_], DIRECTIONS[direction], id_, price, quantity,
+                                                 peak if type_ else None)))
+            except ValueError as e:
+                rejected_by_book.append(InvalidRow(row, id_, str(e)))
+        if rejected_by_book:
+            invalid_rows = sorted(invalid_rows + rejected_by_book)
+        return trades, invalid_rows
+
+    @staticmethod
+    def replay(order_book: OrderBook, lines: Iterable[str], batch_size: int = 65536) -> List[InvalidRow]:
+        """replay
+        Description
+        -----------
+        Feed the whole stream to the book in batches, see 'submitBatch'.
+
+        Returns
+        -------
+        List[InvalidRow]
+            Every invalid order of the stream.
+        """
+        invalid_rows = []
+        for batch in BatchValidator.readBatches(lines, batch_size):
+            invalid_rows.extend(BatchValidator.submitBatch(order_book, batch)[1])
+        return invalid_rows
@@ -0,0 +1,148 @@
+from flash.order_book.OrderProcessing import OrderHandler
+from flash.order_book.OrderDecoder import OrderDecoder
+from flash.python_tool_kit.IOToolKit import IOToolKit
+from typing import TypeVar, Iterable, Iterator, Tuple, Dict, List
+import mmap
+import struct
+import sys
+
+HM = TypeVar("HM", bound=Dict)
+
+FILE_HEADER = b"ORDBOOK1"
+# direction, type, 6 bytes of padding, id, price, quantity, peak (0 for Limit orders); 40 bytes, little endian
+ORDER_RECORD = struct.Struct("<BB6xqqqq")
+
+DIRECTION_CODES = {"Buy": 0, "Sell": 1}
+TYPE_CODES = {"Limit": 0, "Iceberg": 1}
+DIRECTIONS = ("Buy", "Sell")
+TYPES = ("Limit", "Iceberg")
+
+
+class BinaryOrderStream:
+
+    @staticmethod
+    def writeOrders(orders: Iterable[OrderHandler], output_file) -> int:
+        """writeOrders
+        Description
+        -----------
+        Write orders as fixed width binary records, see 'ORDER_RECORD'.
+
+        Parameters
+        ----------
+        orders : Iterable[OrderHandler]
+            Orders to be written.
+        output_file : str
+            Path to the binary file.
+
+        Returns
+        -------
+        int
+            Number of written records.
+
+        Raises
+        ------
+        ValueError
+            If order cannot be represented in binary format, e.g. unknown direction or float price.
+        """
+        records_number = 0
+        with open(output_file, "wb") as f:
+            f.write(FILE_HEADER)
+            for order in orders:
+                try:
+                    record = ORDER_RECORD.pack(DIRECTION_CODES[order.direction], TYPE_CODES[order.type],
+                                               order.id, order.price, order.quantity, order.peak or 0)
+                except (KeyError, struct.error) as e:
+                    raise ValueError(f"Order {order.id} cannot be written in binary format: {order}") from e
+                f.write(record)
+                records_number += 1
+        return records_number
+
+    @staticmethod
+    def convertInputFile(input_file, output_file) -> int:
+        """convertInputFile
+        Description
+        -----------
+        Convert stream of json orders, e.g. 'io/STREAM_FILES/*.in', into binary file.
+
+        Parameters
+        ----------
+        input_file : str
+            Path to the file with orders, one json per line.
+        output_file : str
+            Path to the binary file.
+
+        Returns
+        -------
+        int
+            Number of written records.
+        """
+        return BinaryOrderStream.writeOrders(IOToolKit.streamInputFile(input_file, decoder=OrderDecoder.decodeOrder),
+                                             output_file)
+
+    @staticmethod
+    def iterRecords(file_name) -> Iterator[Tuple[int, int, int, int, int, int]]:
+        """iterRecords
+        Description
+        -----------
+        Read raw records from memory mapped binary file. Records are unpacked straight from the
+        mapped pages, the file is neither read into memory nor copied.
+
+        Parameters
+        ----------
+        file_name : str
+            Path to the binary file.
+
+        Yields
+        ------
+        Tuple[int, int, int, int, int, int]
+            direction code, type code, id, price, quantity, peak
+
+        Raises
+        ------
+        ValueError
+            If the file is not a binary order stream, e.g. it is compressed and cannot be mapped.
+        """
+        if IOToolKit.compressionOf(file_name) is not None:
+            raise ValueError(f"{file_name} is compressed, binary order stream is memory mapped and must be a plain file.")
+        with open(file_name, "rb") as f:
+            if f.read(len(FILE_HEADER)) != FILE_HEADER:
+                raise ValueError(f"{file_name} is not a binary order stream.")
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if (len(mm) - len(FILE_HEADER)) % ORDER_RECORD.size:
+                    raise ValueError(f"{file_name} is truncated.")
+                view = memoryview(mm)
+                body = view[len(FILE_HEADER):]
+                records = ORDER_RECORD.iter_unpack(body)
+                try:
+                    yield from records
+                finally:
+                    # views must be released before the map is closed
+                    del records
+                    body.release()
+                    view.release()
+
+    @staticmethod
+    def replayFile(file_name) -> Iterator[OrderHandler]:
+        """replayFile
+        Description
+        -----------
+        Orders from memory mapped binary file, ready to be passed to 'OrderBook'.
+
+        Parameters
+        ----------
+        file_name : str
+            Path to the binary file.
+
+        Yields
+        ------
+        OrderHandler
+        """
+        from_fields = OrderHandler.fromFields
+        for direction, type_, id_, price, quantity, peak in BinaryOrderStream.iterRecords(file_name):
+            yield from_fields(TYPES[type_], DIRECTIONS[direction], id_, price, quantity, peak if type_ else None)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 3:
+        sys.exit("usage: python -m flash.order_book.BinaryOrderStream INPUT.in OUTPUT.bin")
+    print(f"{BinaryOrderStream.convertInputFile(sys.argv[1], sys.argv[2])} orders written to {sys.argv[2]}")
@@ -0,0 +1,704 @@
+from typing import TypeVar, Iterable, Tuple, Dict, List
+import heapq as h
+import itertools
+from bisect import bisect_left
+from collections import deque
+
+HM = TypeVar("HM", bound=Dict)
+
+# placeholder for heap entries of orders that have been removed from the book (lazy deletion)
+REMOVED = None
+
+
+class HeapBookSide:
+
+    def __init__(self, direction: str) -> None:
+        """__init__
+        Description
+        -----------
+        One side of the order book kept as a heap of [price_key, id, sequence, order] entries.
+        Orders with the same price are prioritised by id, also after an amend that increases volume,
+        unlike in the queues of the other sides. Resting orders are indexed by id,
+        removed orders stay on the heap as tombstones until they reach the top or until they
+        outnumber resting orders, then the heap is rebuilt from resting orders.
+
+        Parameters
+        ----------
+        direction : str
+            'Buy' or 'Sell'.
+        """
+        self.direction = direction
+        self._heap = []
+        # id -> heap entry
+        self._index = {}
+        # number of tombstones on the heap
+        self._removed = 0
+        self._sequence = itertools.count()
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._index
+
+    def priceKey(self, price: int) -> int:
+        """priceKey
+        Description
+        -----------
+        Heap key of the price. Buy side is a max heap, hence prices are negated.
+        """
+        return -price if self.direction == "Buy" else price
+
+    def addOrder(self, order) -> None:
+        """addOrder
+        Description
+        -----------
+        Push new order on the heap.
+
+        Parameters
+        ----------
+        order : OrderHandler
+            Order to rest in the book.
+        """
+        entry = [self.priceKey(order.price), order.id, next(self._sequence), order]
+        self._index[order.id] = entry
+        h.heappush(self._heap, entry)
+
+    def amendOrder(self, order_id: int, quantity: int) -> None:
+        """amendOrder
+        Description
+        -----------
+        Set new volume of resting order. Order keeps its place in the heap.
+
+        Parameters
+        ----------
+        order_id : int
+            Id of resting order.
+        quantity : int
+            New quantity.
+        """
+        self._index[order_id][-1].setQuantity(quantity)
+
+    def fillOrder(self, order_id: int, quantity: int) -> None:
+        """fillOrder
+        Description
+        -----------
+        Subtract traded volume from resting order in place. Order without volume leaves the book.
+
+        Parameters
+        ----------
+        order_id : int
+            Id of resting order.
+        quantity : int
+            Traded quantity.
+        """
+        order = self._index[order_id][-1].updateQuantity(quantity)
+        if order.quantity == 0:
+            self.removeOrder(order_id)
+
+    def sweep(self, price: int, quantity: int) -> List[Tuple]:
+        """sweep
+        Description
+        -----------
+        Fill resting orders that cross 'price' in priority order until 'quantity' is used up, in one pass
+        over the top of the heap. Filled orders are popped at once, without leaving tombstones.
+
+        Parameters
+        ----------
+        price : int
+            Limit price of the incoming order.
+        quantity : int
+            Volume of the incoming order.
+
+        Returns
+        -------
+        List[Tuple[OrderHandler, int, int]]
+            Resting orders in the order they were filled, with traded quantity and quantity visible before the fill.
+        """
+        fills = []
+        limit = self.priceKey(price)
+        heap = self._heap
+        index = self._index
+        while quantity > 0 and heap:
+            entry = heap[0]
+            order = entry[-1]
+            if order is REMOVED:
+                h.heappop(heap)
+                self._removed -= 1
+                continue
+            if entry[0] > limit:
+                break
+            if order.quantity > quantity:
+                fills.append((order, quantity, order.visible_quantity))
+                order.updateQuantity(quantity)
+                break
+            fills.append((order, order.quantity, order.visible_quantity))
+            quantity -= order.quantity
+            order.updateQuantity(order.quantity)
+            h.heappop(heap)
+            del index[order.id]
+        return fills
+
+    def removeOrder(self, order_id: int) -> None:
+        """removeOrder
+        Description
+        -----------
+        Mark heap entry of an order as removed. The entry stays on the heap as a tombstone
+        and is discarded once it reaches the top, so the heap invariant is never broken.
+        Tombstones behind a long-lived top never surface, so once they outnumber resting
+        orders the heap is compacted, which keeps its size within twice the number of orders.
+
+        Parameters
+        ----------
+        order_id : int
+            Id of the order to be removed.
+        """
+        entry = self._index.pop(order_id, None)
+        if entry is not None:
+            entry[-1] = REMOVED
+            self._removed += 1
+            if self._removed > len(self._index):
+                self.compact()
+
+    def compact(self) -> None:
+        """compact
+        Description
+        -----------
+        Drop all tombstones and restore the heap invariant over resting orders in O(n).
+        """
+        heap = self._heap
+        heap[:] = [entry for entry in heap if entry[-1] is not REMOVED]
+        h.heapify(heap)
+        self._removed = 0
+
+    def findOrder(self, order_id: int):
+        """findOrder
+        Description
+        -----------
+        Look up resting order by its id.
+
+        Returns
+        -------
+        OrderHandler
+            Resting order or None if there is no such order on this side.
+        """
+        entry = self._index.get(order_id)
+        return entry[-1] if entry is not None else None
+
+    def bestOrder(self):
+        """bestOrder
+        Description
+        -----------
+        Return the order with the highest priority, discarding tombstones on the way.
+
+        Returns
+        -------
+        OrderHandler
+            Best order or None if this side is empty.
+        """
+        heap = self._heap
+        while heap and heap[0][-1] is REMOVED:
+            h.heappop(heap)
+            self._removed -= 1
+        return heap[0][-1] if heap else None
+
+    def iterOrders(self) -> Iterable:
+        """iterOrders
+        Description
+        -----------
+        Resting orders from the highest priority to the lowest one.
+        """
+        for entry in sorted(self._index.values()):
+            yield entry[-1]
+
+    def depthAtPrice(self, price: int) -> int:
+        """depthAtPrice
+        Description
+        -----------
+        Total volume resting at given price. Heap has no notion of price level, so all orders are visited.
+        """
+        return sum(entry[-1].quantity for entry in self._index.values() if entry[-1].price == price)
+
+
+class PriceLevel:
+
+    __slots__ = ("price", "orders", "volume", "count")
+
+    def __init__(self, price: int) -> None:
+        """__init__
+        Description
+        -----------
+        All orders resting at one price, kept in arrival order.
+
+        Parameters
+        ----------
+        price : int
+            Price of the level.
+        """
+        self.price = price
+        # (level, order) entries shared with the index of the side
+        self.orders = deque()
+        self.volume = 0
+        self.count = 0
+
+
+class PriceLevelBookSide:
+
+    def __init__(self, direction: str) -> None:
+        """__init__
+        Description
+        -----------
+        One side of the order book kept as price levels. Each level is a FIFO queue of orders,
+        so orders with the same price are prioritised by arrival time. Level keys are kept in
+        a sorted list with the best price at the end.
+
+        Parameters
+        ----------
+        direction : str
+            'Buy' or 'Sell'.
+        """
+        self.direction = direction
+        self._levels = {}
+        # ascending list of level keys, best level is the last one
+        self._keys = []
+        # id -> (level, order) entry, the same tuple is queued in the level
+        self._index = {}
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, order_id: int) -> bool:
+        return order_id in self._index
+
+    def priceKey(self, price: int) -> int:
+        """priceKey
+        Description
+        -----------
+        Sort key of the level. Sell prices are negated, so on both sides the best level is the largest key.
+        """
+        return price if self.direction == "Buy" else -price
+
+    def addOrder(self, order) -> None:
+        """addOrder
+        Description
+        -----------
+        Append new order at the end of its price level queue. Creates the level if needed.
+
+        Parameters
+        ----------
+        order : OrderHandler
+            Order to rest in the book.
+        """
+        level = self._levels.get(order.price)
+        if level is None:
+            level = PriceLevel(order.price)
+            self._levels[order.price] = level
+            key = self.priceKey(order.price)
+            self._keys.insert(bisect_left(self._keys, key), key)
+        entry = (level, order)
+        level.orders.append(entry)
+        level.volume += order.quantity
+        level.count += 1
+        self._index[order.id] = entry
+
+    def amendOrder(self, order_id: int, quantity: int) -> None:
+        """amendOrder
+        Description
+        -----------
+        Set new volume of resting order. Order keeps its place in the queue.
+
+        Parameters
+        ----------
+        order_id : int
+            Id of resting order.
+        quantity : int
+            New quantity.
+        """
+        level, order = self._index[order_id]
+        level.volume += quantity - order.quantity
+        order.setQuantity(quantity)
+
+    def fillOrder(self, order_id: int, quantity: int) -> None:
+        """fillOrder
+        Description
+        -----------
+        Subtract traded volume from resting order in place. Order without volume leaves the book.
+
+        Parameters
+        ----------
+        order_id : int
+            Id of resting order.
+        quantity : int
+            Traded quantity.
+        """
+        level, order = self._index[order_id]
+        level.volume -= quantity
+        order.updateQuantity(quantity)
+        if order.quantity == 0:
+            self.removeOrder(order_id)
+
+    def sweep(self, price: int, quantity: int) -> List[Tuple]:
+        """sweep
+        Description
+        -----------
+        Fill resting orders that cross 'price' in priority order until 'quantity' is used up. Levels are
+        walked from the best one and orders within a level from the oldest one in one loop, filled orders
+        are popped from the queue at once and volume, count and keys of a level are updated once per level.
+
+        Parameters
+        ----------
+        price : int
+            Limit price of the incoming order.
+        quantity : int
+            Volume of the incoming order.
+
+        Returns
+        -------
+        List[Tuple[OrderHandler, int, int]]
+            Resting orders in the order they were filled, with traded quantity and quantity visible before the fill.
+        """
+        fills = []
+        limit = self.priceKey(price)
+        keys = self._keys
+        index = self._index
+        while quantity > 0 and keys and keys[-1] >= limit:
+            key = keys[-1]
+            level = self._levels[key if self.direction == "Buy" else -key]
+            orders = level.orders
+            taken = removed = 0
+            while quantity > 0 and removed < level.count:
+                entry = orders[0]
+                order = entry[1]
+                if index.get(order.id) is not entry:
+                    orders.popleft()
+                    continue
+                if order.quantity > quantity:
+                    fills.append((order, quantity, order.visible_quantity))
+                    taken += quantity
+                    order.updateQuantity(quantity)
+                    quantity = 0
+                    break
+                fills.append((order, order.quantity, order.visible_quantity))
+                taken += order.quantity
+                quantity -= order.quantity
+                order.updateQuantity(order.quantity)
+                del index[order.id]
+                orders.popleft()
+                removed += 1
+            level.volume -= taken
+            level.count -= removed
+            if level.count == 0:
+                del self._levels[level.price]
+                keys.pop()
+        return fills
+
+    def removeOrder(self, order_id: int) -> None:
+        """removeOrder
+        Description
+        -----------
+        Remove order from the book. The order is dropped from the index at once and its queue entry
+        is skipped when it reaches the front of the queue, empty levels are removed immediately.
+        Entries are compared by identity, so order removed and added again is not served twice.
+        Entries behind a long-lived front order never reach the front, so once removed entries
+        outnumber live orders of the level its queue is compacted.
+
+        Parameters
+        ----------
+        order_id : int
+            Id of the order to be removed.
+        """
+        item = self._index.pop(order_id, None)
+        if item is None:
+            return
+        level, order = item
+        level.volume -= order.quantity
+        level.count -= 1
+        if level.count == 0:
+            self.removeLevel(level)
+        elif level.orders[0] is item:
+            level.orders.popleft()
+        elif len(level.orders) > 2 * level.count:
+            self.compactLevel(level)
+
+    def compactLevel(self, level: PriceLevel) -> None:
+        """compactLevel
+        Description
+        -----------
+        Drop removed entries from the queue of the level, live orders keep their arrival order.
+        """
+        index = self._index
+        live = [entry for entry in level.orders if index.get(entry[1].id) is entry]
+        level.orders.clear()
+        level.orders.extend(live)
+
+    def removeLevel(self, level: PriceLevel) -> None:
+        """removeLevel
+        Description
+        -----------
+        Drop price level without live orders.
+        """
+        del self._levels[level.price]
+        key = self.priceKey(level.price)
+        if self._keys[-1] == key:
+            self._keys.pop()
+        else:
+            del self._keys[bisect_left(self._keys, key)]
+
+    def findOrder(self, order_id: int):
+        """findOrder
+        Description
+        -----------
+        Look up resting order by its id.
+
+        Returns
+        -------
+        OrderHandler
+            Resting order or None if there is no such order on this side.
+        """
+        item = self._index.get(order_id)
+        return item[1] if item is not None else None
+
+    def bestLevel(self) -> PriceLevel:
+        """bestLevel
+        Description
+        -----------
+        Level with the best price or None if this side is empty.
+        """
+        if not self._keys:
+            return None
+        key = self._keys[-1]
+        return self._levels[key if self.direction == "Buy" else -key]
+
+    def bestOrder(self):
+        """bestOrder
+        Description
+        -----------
+        Return the oldest order at the best price level, skipping removed orders.
+
+        Returns
+        -------
+        OrderHandler
+            Best order or None if this side is empty.
+        """
+        level = self.bestLevel()
+        if level is None:
+            return None
+        orders = level.orders
+        index = self._index
+        while index.get(orders[0][1].id) is not orders[0]:
+            orders.popleft()
+        return orders[0][1]
+
+    def iterOrders(self) -> Iterable:
+        """iterOrders
+        Description
+        -----------
+        Resting orders from the highest priority to the lowest one: best level first, oldest order first.
+        """
+        index = self._index
+        for key in reversed(self._keys):
+            for entry in self._levels[key if self.direction == "Buy" else -key].orders:
+                if index.get(entry[1].id) is entry:
+                    yield entry[1]
+
+    def depthAtPrice(self, price: int) -> int:
+        """depthAtPrice
+        Description
+        -----------
+        Total volume resting at given price.
+        """
+        level = self._levels.get(price)
+        return level.volume if level is not None else 0
+
+
+class TickLadderBookSide(PriceLevelBookSide):
+
+    def __init__(self, direction: str, min_price: int = 0, max_price: int = 100000, tick: int = 1) -> None:
+        """__init__
+        Description
+        -----------
+        One side of the order book for instrument traded on a fixed tick grid within a known price band.
+        Price levels are kept in a preallocated list indexed by '(price - min_price) // tick' instead of
+        a hash map with sorted keys, a level is created on first use and then reused. Pointer to the best
+        level moves incrementally, so insert, cancel and best price lookup do not depend on number of levels.
+        Orders, queues and volumes are handled as in 'PriceLevelBookSide'.
+
+        Parameters
+        ----------
+        direction : str
+            'Buy' or 'Sell'.
+        min_price : int
+            Lowest price of the band.
+        max_price : int
+            Highest price of the band.
+        tick : int
+            Price step of the grid.
+        """
+        if tick <= 0 or max_price < min_price:
+            raise ValueError("Tick must be positive and price band must not be empty.")
+        self.direction = direction
+        self.min_price = min_price
+        self.max_price = max_price
+        self.tick = tick
+        self._levels = [None] * ((max_price - min_price) // tick + 1)
+        # id -> (level, order) entry, the same tuple is queued in the level
+        self._index = {}
+        # slot of the best level, None if this side is empty; worse prices are lower slots on buy side
+        self._best = None
+
+    def acceptsPrice(self, price: int) -> bool:
+        """acceptsPrice
+        Description
+        -----------
+        True if price is an integer within the band and on the tick grid.
+        """
+        return (isinstance(price, int) and self.min_price <= price <= self.max_price
+                and (price - self.min_price) % self.tick == 0)
+
+    def slotOf(self, price: int) -> int:
+        if not self.acceptsPrice(price):
+            raise ValueError(f"Price {price} is out of the band [{self.min_price}, {self.max_price}] "
+                             f"or off the tick grid {self.tick}.")
+        return (price - self.min_price) // self.tick
+
+    def addOrder(self, order) -> None:
+        """addOrder
+        Description
+        -----------
+        Append new order at the end of its level queue, best level pointer moves if the price is better.
+
+        Parameters
+        ----------
+        order : OrderHandler
+            Order to rest in the book.
+        """
+        levels = self._levels
+        offset = order.price - self.min_price
+        slot = offset // self.tick
+        if offset < 0 or slot >= len(levels) or offset % self.tick:
+            self.slotOf(order.price)
+        level = levels[slot]
+        if level is None:
+            level = levels[slot] = PriceLevel(order.price)
+        entry = (level, order)
+        level.orders.append(entry)
+        level.volume += order.quantity
+        level.count += 1
+        self._index[order.id] = entry
+        best = self._best
+        if best is None or (slot > best if self.direction == "Buy" else slot < best):
+            self._best = slot
+
+    def sweep(self, price: int, quantity: int) -> List[Tuple]:
+        """sweep
+        Description
+        -----------
+        Fill resting orders that cross 'price' in priority order until 'quantity' is used up, walking levels
+        from the best one, see 'PriceLevelBookSide.sweep'.
+
+        Parameters
+        ----------
+        price : int
+            Limit price of the incoming order.
+        quantity : int
+            Volume of the incoming order.
+
+        Returns
+        -------
+        List[Tuple[OrderHandler, int, int]]
+            Resting orders in the order they were filled, with traded quantity and quantity visible before the fill.
+        """
+        fills = []
+        index = self._index
+        levels = self._levels
+        buy = self.direction == "Buy"
+        while quantity > 0 and self._best is not None:
+            level = levels[self._best]
+            if (level.price < price) if buy else (level.price > price):
+                break
+            orders = level.orders
+            taken = removed = 0
+            while quantity > 0 and removed < level.count:
+                entry = orders[0]
+                order = entry[1]
+                if index.get(order.id) is not entry:
+                    orders.popleft()
+                    continue
+                if order.quantity > quantity:
+                    fills.append((order, quantity, order.visible_quantity))
+                    taken += quantity
+                    order.updateQuantity(quantity)
+                    quantity = 0
+                    break
+                fills.append((order, order.quantity, order.visible_quantity))
+                taken += order.quantity
+                quantity -= order.quantity
+                order.updateQuantity(order.quantity)
+                del index[order.id]
+                orders.popleft()
+                removed += 1
+            level.volume -= taken
+            level.count -= removed
+            if level.count == 0:
+                self.removeLevel(level)
+        return fills
+
+    def removeLevel(self, level: PriceLevel) -> None:
+        """removeLevel
+        Description
+        -----------
+        Empty level stays in its slot for reuse, removed entries left in its queue are dropped.
+        If it was the best level then the pointer moves towards worse prices to the next level with orders.
+        """
+        level.orders.clear()
+        if (level.price - self.min_price) // self.tick != self._best:
+            return
+        if not self._index:
+            self._best = None
+            return
+        levels = self._levels
+        step = -1 if self.direction == "Buy" else 1
+        slot = self._best + step
+        while levels[slot] is None or levels[slot].count == 0:
+            slot += step
+        self._best = slot
+
+    def bestLevel(self) -> PriceLevel:
+        """bestLevel
+        Description
+        -----------
+        Level with the best price or None if this side is empty.
+        """
+        return self._levels[self._best] if self._best is not None else None
+
+    def iterOrders(self) -> Iterable:
+        """iterOrders
+        Description
+        -----------
+        Resting orders from the highest priority to the lowest one: best level first, oldest order first.
+        Slots are visited from the best one to the worst one with orders.
+        """
+        index = self._index
+        remaining = len(index)
+        slot = self._best
+        step = -1 if self.direction == "Buy" else 1
+        while remaining:
+            level = self._levels[slot]
+            if level is not None and level.count:
+                for entry in level.orders:
+                    if index.get(entry[1].id) is entry:
+                        remaining -= 1
+                        yield entry[1]
+            slot += step
+
+    def depthAtPrice(self, price: int) -> int:
+        """depthAtPrice
+        Description
+        -----------
+        Total volume resting at given price.
+        """
+        level = self._levels[(price - self.min_price) // self.tick] if self.acceptsPrice(price) else None
+        return level.volume if level is not None else 0
+
+
+BOOK_SIDES = {"heap": HeapBookSide, "price_level": PriceLevelBookSide, "tick_ladder": TickLadderBookSide}
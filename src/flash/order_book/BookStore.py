@@ -0,0 +1,300 @@
+from flash.order_book.OrderProcessing import OrderBook, OrderHandler
+from flash.order_book.OutputWriter import OutputWriter
+from flash.order_book.TradeSink import NullTradeSink
+from flash.order_book.MarketView import MarketView
+from typing import TypeVar, Iterable, Iterator, Tuple, Dict, List
+import os
+import struct
+import sys
+
+HM = TypeVar("HM", bound=Dict)
+
+JOURNAL_HEADER = b"OBJRNL01"
+SNAPSHOT_HEADER = b"OBSNAP01"
+# kind, direction, type, 5 bytes of padding, sequence, id, price, quantity, peak; 48 bytes, little endian
+# fills keep buy id in 'id' and sell id in 'peak'
+JOURNAL_RECORD = struct.Struct("<BBB5xqqqqq")
+# sequence of the last event in the snapshot, number of orders
+SNAPSHOT_INFO = struct.Struct("<qq")
+# direction, type, 6 bytes of padding, id, price, quantity, visible quantity, peak (0 for Limit orders)
+SNAPSHOT_RECORD = struct.Struct("<BB6xqqqqq")
+
+SUBMIT, CANCEL, AMEND, FILL = 1, 2, 3, 4
+DIRECTION_CODES = {"Buy": 0, "Sell": 1}
+TYPE_CODES = {"Limit": 0, "Iceberg": 1}
+DIRECTIONS = ("Buy", "Sell")
+TYPES = ("Limit", "Iceberg")
+
+
+class BookStore:
+
+    def __init__(self, directory, snapshot_every: int = 100000, flush_every: int = 1, fsync: bool = False) -> None:
+        """__init__
+        Description
+        -----------
+        Write-ahead journal and periodic snapshots of a book, kept in 'directory'.
+        Every accepted order, cancel and amend is written to the journal 'journal.bin' before it changes
+        the book, so before any of its trades or output is published. Fills follow their event and are
+        written together with the next event, recovery replays events and does not need them. Every
+        'snapshot_every' events resting orders are written to 'snapshot.bin' and the journal starts
+        from scratch, so restart with 'recover' reads one snapshot and at most 'snapshot_every'
+        events whatever the length of the session.
+        By default written records survive a crash of the process but not of the machine, they are
+        synced to disk only with 'fsync'. With 'flush_every' above 1 up to 'flush_every' - 1 events
+        published before a crash might be lost.
+        Store is passed to the book with 'OrderBook(..., journal=store)'.
+
+        Parameters
+        ----------
+        directory : str
+            Directory of the store, created if needed.
+        snapshot_every : int
+            Number of events between two snapshots.
+        flush_every : int
+            Number of events between writes of the journal buffer to the file, 1 writes every event ahead.
+        fsync : bool
+            If True then the journal is synced to disk whenever it is written, off by default.
+        """
+        if snapshot_every <= 0 or flush_every <= 0:
+            raise ValueError("Number of events between snapshots and between flushes must be positive.")
+        os.makedirs(directory, exist_ok=True)
+        self.journal_file = os.path.join(directory, "journal.bin")
+        self.snapshot_file = os.path.join(directory, "snapshot.bin")
+        self._snapshot_every = snapshot_every
+        self._flush_every = flush_every
+        self._fsync = fsync
+        self._journal = None
+        self._pending = []
+        self._sequence = 0
+        self._events_since_snapshot = 0
+
+    # ------------------
+    # Region: Journal
+    # ------------------
+    def start(self) -> None:
+        """start
+        Description
+        -----------
+        Start store of a new book, previous snapshot and journal are removed.
+        """
+        for file_name in (self.snapshot_file, self.journal_file):
+            if os.path.exists(file_name):
+                os.remove(file_name)
+        self._events_since_snapshot = 0
+        self.openJournal(0)
+
+    def openJournal(self, sequence: int) -> None:
+        """openJournal
+        Description
+        -----------
+        Start appending events after 'sequence'. Existing journal is kept, torn record at its end is cut off.
+        """
+        self._sequence = sequence
+        if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) >= len(JOURNAL_HEADER):
+            size = os.path.getsize(self.journal_file)
+            self._journal = open(self.journal_file, "r+b")
+            self._journal.truncate(size - (size - len(JOURNAL_HEADER)) % JOURNAL_RECORD.size)
+            self._journal.seek(0, os.SEEK_END)
+        else:
+            self._journal = open(self.journal_file, "wb")
+            self._journal.write(JOURNAL_HEADER)
+            self.sync()
+
+    def append(self, kind: int, order_id: int, direction: str = None, type: str = None, price: int = 0,
+               quantity: int = 0, peak: int = None) -> None:
+        self._pending.append(JOURNAL_RECORD.pack(kind, DIRECTION_CODES.get(direction, 0), TYPE_CODES.get(type, 0),
+                                                 self._sequence, order_id, price, quantity, peak or 0))
+
+    def writeAhead(self) -> None:
+        """writeAhead
+        Description
+        -----------
+        Write the event just appended, with fills of previous events, every 'flush_every' events.
+        Called before the event changes the book.
+        """
+        if (self._events_since_snapshot + 1) % self._flush_every == 0:
+            self.flush()
+
+    def orderAccepted(self, order: OrderHandler) -> None:
+        self._sequence += 1
+        self.append(SUBMIT, order.id, order.direction, order.type, order.price, order.quantity, order.peak)
+        self.writeAhead()
+
+    def orderCancelled(self, order_id: int) -> None:
+        self._sequence += 1
+        self.append(CANCEL, order_id)
+        self.writeAhead()
+
+    def orderAmended(self, order_id: int, quantity: int) -> None:
+        self._sequence += 1
+        self.append(AMEND, order_id, quantity=quantity)
+        self.writeAhead()
+
+    def tradeMade(self, trade) -> None:
+        self.append(FILL, trade.buyOrderId, price=trade.price, quantity=trade.quantity, peak=trade.sellOrderId)
+
+    def eventProcessed(self, order_book: OrderBook) -> None:
+        """eventProcessed
+        Description
+        -----------
+        End of the event, snapshot is taken every 'snapshot_every' events. The event itself is already
+        written, see 'writeAhead', its fills wait for the next write.
+        """
+        self._events_since_snapshot += 1
+        if self._events_since_snapshot >= self._snapshot_every:
+            self.takeSnapshot(order_book)
+
+    def flush(self) -> None:
+        if self._pending:
+            self._journal.write(b"".join(self._pending))
+            self._pending.clear()
+            self.sync()
+
+    def sync(self) -> None:
+        self._journal.flush()
+        if self._fsync:
+            os.fsync(self._journal.fileno())
+
+    def close(self) -> None:
+        if self._journal is not None:
+            self.flush()
+            self._journal.close()
+            self._journal = None
+
+    @staticmethod
+    def readJournal(file_name) -> Iterator[Tuple[int, int, int, int, int, int, int, int]]:
+        """readJournal
+        Description
+        -----------
+        Records of the journal, torn record at the end of the file is ignored.
+
+        Yields
+        ------
+        Tuple[int, int, int, int, int, int, int, int]
+            kind, direction code, type code, sequence, id, price, quantity, peak
+        """
+        with open(file_name, "rb") as f:
+            if f.read(len(JOURNAL_HEADER)) != JOURNAL_HEADER:
+                raise ValueError(f"{file_name} is not a journal of the book.")
+            data = f.read()
+        yield from JOURNAL_RECORD.iter_unpack(data[:len(data) - len(data) % JOURNAL_RECORD.size])
+
+    # ------------------
+    # End Region: Journal
+    # ------------------
+
+    # ------------------
+    # Region: Snapshot
+    # ------------------
+    def takeSnapshot(self, order_book: OrderBook) -> None:
+        """takeSnapshot
+        Description
+        -----------
+        Write resting orders in priority order to a temporary file, replace the snapshot with it
+        and start new journal. Crash in between leaves old journal next to new snapshot, its
+        events are already in the snapshot and are skipped by sequence on restart.
+        """
+        self.flush()
+        temporary_file = self.snapshot_file + ".tmp"
+        orders = [order for side in (order_book.buy_side, order_book.sell_side) for order in side.iterOrders()]
+        with open(temporary_file, "wb") as f:
+            f.write(SNAPSHOT_HEADER)
+            f.write(SNAPSHOT_INFO.pack(self._sequence, len(orders)))
+            f.write(b"".join([SNAPSHOT_RECORD.pack(DIRECTION_CODES[o.direction], TYPE_CODES[o.type], o.id, o.price,
+                                                   o.quantity, o.visible_quantity, o.peak or 0) for o in orders]))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temporary_file, self.snapshot_file)
+        if self._journal is not None:
+            self._journal.close()
+            os.remove(self.journal_file)
+            self.openJournal(self._sequence)
+        self._events_since_snapshot = 0
+
+    def loadSnapshot(self, order_book: OrderBook) -> int:
+        """loadSnapshot
+        Description
+        -----------
+        Put orders from the snapshot on the book in the order they were written, so they keep their priority.
+
+        Returns
+        -------
+        int
+            Sequence of the last event in the snapshot, 0 if there is no snapshot.
+        """
+        if not os.path.exists(self.snapshot_file):
+            return 0
+        with open(self.snapshot_file, "rb") as f:
+            if f.read(len(SNAPSHOT_HEADER)) != SNAPSHOT_HEADER:
+                raise ValueError(f"{self.snapshot_file} is not a snapshot of the book.")
+            sequence, orders_number = SNAPSHOT_INFO.unpack(f.read(SNAPSHOT_INFO.size))
+            data = f.read(orders_number * SNAPSHOT_RECORD.size)
+        if len(data) != orders_number * SNAPSHOT_RECORD.size:
+            raise ValueError(f"{self.snapshot_file} is truncated.")
+        for direction, type_, id_, price, quantity, visible_quantity, peak in SNAPSHOT_RECORD.iter_unpack(data):
+            order = OrderHandler.fromFields(TYPES[type_], DIRECTIONS[direction], id_, price, quantity,
+                                            peak if type_ else None)
+            order.visible_quantity = visible_quantity
+            order_book.sideOf(order.direction).addOrder(order)
+            order_book.uploadToOrderStatus(order)
+        return sequence
+
+    # ------------------
+    # End Region: Snapshot
+    # ------------------
+
+    def recover(self, book_type: str = "price_level", output: OutputWriter = None, trade_sink=None,
+                book_options: HM = None, market_view: MarketView = None) -> OrderBook:
+        """recover
+        Description
+        -----------
+        Rebuild the book from the latest snapshot and the tail of the journal, then keep journaling
+        new events. Replayed events are not written to 'output' nor 'trade_sink' again, destinations
+        are attached to the book once it is rebuilt, see 'OrderBook.attach'.
+
+        Parameters
+        ----------
+        book_type : str
+            Backend of the book, see 'BookSides.BOOK_SIDES'.
+        output : OutputWriter
+            Writer of events after the restart.
+        trade_sink : TradeSink
+            Destination of trades after the restart.
+        book_options : HM
+            Arguments of the backend, see 'OrderBook'.
+        market_view : MarketView
+            View of the book after the restart, loaded with recovered orders.
+
+        Returns
+        -------
+        OrderBook
+        """
+        order_book = OrderBook(book_type=book_type, book_options=book_options, output=OutputWriter(),
+                               trade_sink=NullTradeSink(batch_size=4096))
+        sequence = self.loadSnapshot(order_book)
+        self._events_since_snapshot = 0
+        if os.path.exists(self.journal_file) and os.path.getsize(self.journal_file) >= len(JOURNAL_HEADER):
+            for kind, direction, type_, event_sequence, id_, price, quantity, peak in self.readJournal(self.journal_file):
+                if event_sequence <= sequence or kind == FILL:
+                    continue
+                if kind == SUBMIT:
+                    order_book.submit(OrderHandler.fromFields(TYPES[type_], DIRECTIONS[direction], id_, price, quantity,
+                                                              peak if type_ else None))
+                elif kind == CANCEL:
+                    order_book.cancel(id_)
+                else:
+                    order_book.amend(id_, quantity)
+                sequence = event_sequence
+                self._events_since_snapshot += 1
+        order_book.attach(output=output if output is not None else OutputWriter(), trade_sink=trade_sink,
+                          journal=self, market_view=market_view)
+        self.openJournal(sequence)
+        return order_book
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m flash.order_book.BookStore DIRECTORY")
+    store = BookStore(sys.argv[1])
+    print(store.recover().snapshot())
+    store.close()
@@ -0,0 +1,296 @@
+from flash.order_book.OrderProcessing import OrderBook
+from flash.order_book.OrderDecoder import OrderDecoder
+from flash.order_book.OutputWriter import OUTPUT_MODES, PeriodicSnapshotWriter
+from flash.order_book.TradeSink import TRADE_FORMATS
+from flash.order_book.Instrumentation import Instrumentation, Profiler, PROFILE_MODES
+from flash.order_book.BinaryOrderStream import BinaryOrderStream
+from flash.order_book.BatchValidator import BatchValidator
+from flash.order_book.SymbolRouter import SymbolRouter
+from flash.order_book.BookStore import BookStore
+from flash.python_tool_kit.IOToolKit import IOToolKit, COMPRESSIONS
+from concurrent.futures import ProcessPoolExecutor
+from typing import TypeVar, Iterable, Tuple, Dict, List
+import contextlib
+import itertools
+import json
+import os
+import time
+
+HM = TypeVar("HM", bound=Dict)
+
+# placeholder of the input name in paths of per file destinations, e.g. 'trades/{name}.csv'
+NAME_FIELD = "{name}"
+
+
+class FileReplay:
+
+    def __init__(self, output_directory, output_mode: str = "snapshot", snapshot_every: int = 1000,
+                 book_type: str = "price_level", jobs: int = None, compression: str = None, binary: bool = False,
+                 batch_size: int = None, workers: int = None, trade_log: str = None, trade_format: str = "line",
+                 trade_batch: int = 1, instrument: str = None, metrics_file: str = None, metrics_format: str = "json",
+                 journal_directory: str = None, journal_snapshot_every: int = 100000) -> None:
+        """__init__
+        Description
+        -----------
+        Replay many stream files, each in its own book. Files are independent, so they are spread over
+        a pool of processes and the run uses all cores. Output of 'name.in' or compressed 'name.in.gz' is
+        written to 'name.out' in 'output_directory', summary of the run to 'summary.json' next to it.
+        Paths of other per file destinations, trade log, metrics and journal, might contain '{name}',
+        replaced by the name of the input file. It is required when more files are replayed.
+
+        Parameters
+        ----------
+        output_directory : str
+            Directory of output files, created if needed.
+        output_mode : str
+            Writer of every book, see 'OutputWriter.OUTPUT_MODES'.
+        snapshot_every : int
+            Number of orders between two snapshots in 'periodic' mode.
+        book_type : str
+            Backend of every book, see 'BookSides.BOOK_SIDES'.
+        jobs : int
+            Number of processes, number of cores by default. With 1 files are replayed in this process.
+        compression : str
+            Extension of compressed output, e.g. '.gz' gives 'name.out.gz', see 'IOToolKit.COMPRESSIONS'.
+        binary : bool
+            Input files are binary streams, see 'BinaryOrderStream'.
+        batch_size : int
+            If given then orders are validated in batches, see 'BatchValidator', and every invalid order is
+            reported in the summary instead of stopping the file.
+        workers : int
+            If given then every symbol has its own book, matched by 'workers' processes, see 'SymbolRouter'.
+            Final book of every symbol and merged trades are written.
+        trade_log : str
+            File where trades are written as they happen, see 'TradeSink'.
+        trade_format : str
+            Format of the trade log, see 'TradeSink.TRADE_FORMATS'.
+        trade_batch : int
+            Number of trades written to the trade log at once.
+        instrument : str
+            'timers' or one of 'Instrumentation.PROFILE_MODES'.
+        metrics_file : str
+            Destination of timers or of the capture, required by profile modes. Without it timers are kept in the summary.
+        metrics_format : str
+            'json' or 'prometheus', format of timers.
+        journal_directory : str
+            Directory where the book is journaled, see 'BookStore'.
+        journal_snapshot_every : int
+            Number of events between two snapshots of the journaled book.
+        """
+        if output_mode not in OUTPUT_MODES:
+            raise ValueError(f"Output mode might be only one of {list(OUTPUT_MODES)}.")
+        self.jobs = jobs or os.cpu_count() or 1
+        if self.jobs <= 0:
+            raise ValueError("Number of jobs must be positive.")
+        if compression is not None and compression not in COMPRESSIONS:
+            raise ValueError(f"Compression might be only one of {list(COMPRESSIONS)}.")
+        if trade_format not in TRADE_FORMATS:
+            raise ValueError(f"Trade format might be only one of {list(TRADE_FORMATS)}.")
+        if instrument not in (None, "timers") + PROFILE_MODES:
+            raise ValueError(f"Instrumentation might be only one of {['timers'] + list(PROFILE_MODES)}.")
+        if instrument in PROFILE_MODES and metrics_file is None:
+            raise ValueError(f"Instrumentation {instrument} requires metrics file.")
+        if batch_size is not None and binary:
+            raise ValueError("Batch validation cannot be combined with binary input.")
+        if workers is not None and (batch_size is not None or binary or trade_log is not None or instrument is not None
+                                    or output_mode != "snapshot" or journal_directory is not None):
+            raise ValueError("Book per symbol cannot be combined with batches, binary input, trade log, "
+                             "instrumentation, output mode nor journal.")
+        self.compression = compression
+        self.output_directory = output_directory
+        self.options = {"output_mode": output_mode, "snapshot_every": snapshot_every, "book_type": book_type,
+                        "binary": binary, "batch_size": batch_size, "workers": workers, "trade_format": trade_format,
+                        "trade_batch": trade_batch, "instrument": instrument, "metrics_format": metrics_format,
+                        "journal_snapshot_every": journal_snapshot_every}
+        self.destinations = {"trade_log": trade_log, "metrics_file": metrics_file, "journal_directory": journal_directory}
+
+    @staticmethod
+    def inputName(input_file) -> str:
+        return os.path.splitext(IOToolKit.stripCompression(os.path.basename(input_file)))[0]
+
+    @staticmethod
+    def replayFile(input_file, output_file, output_mode: str = "snapshot", snapshot_every: int = 1000,
+                   book_type: str = "price_level", binary: bool = False, batch_size: int = None, workers: int = None,
+                   trade_log: str = None, trade_format: str = "line", trade_batch: int = 1, instrument: str = None,
+                   metrics_file: str = None, metrics_format: str = "json", journal_directory: str = None,
+                   journal_snapshot_every: int = 100000) -> HM:
+        """replayFile
+        Description
+        -----------
+        Replay single stream file in a new book, options as in '__init__' with destinations of this file.
+        Invalid order stops the file unless orders are validated in batches, output written so far is kept and the error
+        is reported in the summary. Any failure of the file, also of reading or writing it, is only reported,
+        so it never stops replay of the other files.
+
+        Returns
+        -------
+        HM
+            Summary of the file: input, output, orders processed, trades, wall time and error, None if there was none.
+            Orders rejected in batches are listed in 'rejected' and timers kept without metrics file in 'metrics'.
+        """
+        start = time.perf_counter()
+        summary = {"input": input_file, "output": output_file, "orders": 0, "trades": 0, "error": None}
+        try:
+            with contextlib.ExitStack() as stack:
+                if instrument in PROFILE_MODES:
+                    stack.enter_context(Profiler(instrument, metrics_file))
+                if workers is not None:
+                    FileReplay.replaySymbols(summary, input_file, output_file, book_type, workers)
+                else:
+                    FileReplay.replayBook(summary, stack, input_file, output_file, output_mode, snapshot_every,
+                                          book_type, binary, batch_size, trade_log, trade_format, trade_batch,
+                                          instrument, metrics_file, metrics_format, journal_directory,
+                                          journal_snapshot_every)
+        except Exception as e:
+            summary["error"] = summary["error"] or f"{type(e).__name__}: {e}"
+        summary["wall_time_s"] = time.perf_counter() - start
+        return summary
+
+    @staticmethod
+    def replayBook(summary: HM, stack: contextlib.ExitStack, input_file, output_file, output_mode: str,
+                   snapshot_every: int, book_type: str, binary: bool, batch_size: int, trade_log: str,
+                   trade_format: str, trade_batch: int, instrument: str, metrics_file: str, metrics_format: str,
+                   journal_directory: str, journal_snapshot_every: int) -> None:
+        """replayBook
+        Description
+        -----------
+        Replay the file in one book, counts and error are recorded in 'summary'. Files are closed by 'stack'.
+        """
+        f = stack.enter_context(IOToolKit.openFile(output_file, "w"))
+        if output_mode == "periodic":
+            writer = PeriodicSnapshotWriter(stream=f, every=snapshot_every)
+        else:
+            writer = OUTPUT_MODES[output_mode](stream=f)
+        trade_sink = None
+        if trade_log is not None:
+            trade_stream = stack.enter_context(IOToolKit.openFile(trade_log, "wb" if trade_format == "binary" else "w"))
+            trade_sink = TRADE_FORMATS[trade_format](stream=trade_stream, batch_size=trade_batch)
+        journal = None
+        if journal_directory is not None:
+            journal = BookStore(journal_directory, snapshot_every=journal_snapshot_every)
+        instrumentation = Instrumentation() if instrument == "timers" else None
+        book = OrderBook(book_type=book_type, output=writer, trade_sink=trade_sink, instrumentation=instrumentation,
+                         journal=journal)
+        if binary:
+            orders = BinaryOrderStream.replayFile(input_file)
+        elif batch_size is not None:
+            # blank lines are kept, so rejected orders are reported with their line in the file
+            orders = IOToolKit.streamInputFile(input_file, decoder=str, blank_lines=True)
+        else:
+            orders = IOToolKit.streamInputFile(input_file, decoder=OrderDecoder.decodeOrder)
+        if instrumentation is not None:
+            orders = instrumentation.timedStream("parse", orders)
+        try:
+            if batch_size is not None:
+                summary["rejected"] = []
+                for batch in BatchValidator.readBatches(orders, batch_size):
+                    trades, invalid_rows = BatchValidator.submitBatch(book, batch)
+                    # orders not decoded are not in the batch columns
+                    summary["orders"] += len(batch) - len(invalid_rows) + len(batch.rejected)
+                    summary["trades"] += len(trades)
+                    summary["rejected"].extend({"row": row.row, "reason": row.reason} for row in invalid_rows)
+            else:
+                submit = book.submit
+                for order in orders:
+                    summary["trades"] += len(submit(order))
+                    summary["orders"] += 1
+        except Exception as e:
+            summary["error"] = f"{type(e).__name__}: {e}"
+            writer.flush()
+            if trade_sink is not None:
+                trade_sink.flush()
+            if journal is not None:
+                journal.close()
+        else:
+            book.flushOrderBook()
+        if instrumentation is not None:
+            metrics = instrumentation.toJson() if metrics_format == "json" else instrumentation.toPrometheus()
+            if metrics_file is None:
+                summary["metrics"] = metrics
+            else:
+                with open(metrics_file, "w") as m:
+                    m.write(metrics)
+
+    @staticmethod
+    def replaySymbols(summary: HM, input_file, output_file, book_type: str, workers: int) -> None:
+        """replaySymbols
+        Description
+        -----------
+        Replay the file in a book per symbol, see 'SymbolRouter'. Final book of every symbol is written,
+        followed by merged trades tagged with symbol. Nothing is written if any order is invalid.
+        """
+        # zip takes a line first, so the counter ends at the number of lines read
+        read = itertools.count()
+        books, trades = SymbolRouter(workers=workers, book_type=book_type).run(
+            line for line, _ in zip(IOToolKit.streamInputFile(input_file, decoder=str), read))
+        with IOToolKit.openFile(output_file, "w") as f:
+            for symbol in sorted(books, key=str):
+                f.write(f"{dict(symbol=symbol, **books[symbol])}\n")
+            for symbol, trade in trades:
+                f.write(f"{dict(symbol=symbol, **trade._asdict())}\n")
+                summary["trades"] += 1
+        summary["orders"] = next(read)
+
+    def outputFiles(self, input_files: List[str]) -> List[str]:
+        """outputFiles
+        Description
+        -----------
+        Output file of every input file. Two inputs with the same name would overwrite one output, so they are refused.
+        """
+        suffix = ".out" + (self.compression or "")
+        output_files = [os.path.join(self.output_directory, self.inputName(input_file) + suffix)
+                        for input_file in input_files]
+        if len(set(output_files)) != len(output_files):
+            raise ValueError("Input files must have different names, their outputs are written to one directory.")
+        return output_files
+
+    def destinationsOf(self, input_files: List[str]) -> List[HM]:
+        """destinationsOf
+        Description
+        -----------
+        Trade log, metrics file and journal directory of every input file, '{name}' is replaced by its name.
+        More files would share one destination without '{name}', so they are refused.
+        """
+        if len(input_files) > 1:
+            shared = [key for key, path in self.destinations.items() if path is not None and NAME_FIELD not in path]
+            if shared:
+                raise ValueError(f"Paths of {', '.join(shared)} must contain {NAME_FIELD} when more files are replayed.")
+        return [{key: None if path is None else path.replace(NAME_FIELD, self.inputName(input_file))
+                 for key, path in self.destinations.items()} for input_file in input_files]
+
+    def run(self, input_files: List[str]) -> HM:
+        """run
+        Description
+        -----------
+        Replay all files and write the summary.
+
+        Parameters
+        ----------
+        input_files : List[str]
+            Stream files, e.g. from 'IOToolKit.collectInputFiles'.
+
+        Returns
+        -------
+        HM
+            Summary of the run with summary of every file in the order of 'input_files'.
+        """
+        output_files = self.outputFiles(input_files)
+        destinations = self.destinationsOf(input_files)
+        os.makedirs(self.output_directory, exist_ok=True)
+        start = time.perf_counter()
+        if self.jobs == 1 or len(input_files) <= 1:
+            files = [self.replayFile(input_file, output_file, **self.options, **destination)
+                     for input_file, output_file, destination in zip(input_files, output_files, destinations)]
+        else:
+            with ProcessPoolExecutor(max_workers=min(self.jobs, len(input_files))) as pool:
+                futures = [pool.submit(self.replayFile, input_file, output_file, **self.options, **destination)
+                           for input_file, output_file, destination in zip(input_files, output_files, destinations)]
+                files = [future.result() for future in futures]
+        summary = {"files": files, "orders": sum(file["orders"] for file in files),
+                   "trades": sum(file["trades"] for file in files),
+                   "failed": sum(file["error"] is not None for file in files),
+                   "wall_time_s": time.perf_counter() - start, "jobs": self.jobs}
+        with open(os.path.join(self.output_directory, "summary.json"), "w") as f:
+            json.dump(summary, f, indent=2)
+            f.write("\n")
+        return summary
@@ -0,0 +1,291 @@
+from typing import TypeVar, Iterable, Iterator, Tuple, Dict, List
+import cProfile
+import json
+import pstats
+import time
+import tracemalloc
+
+HM = TypeVar("HM", bound=Dict)
+
+# stage -> methods of 'OrderBook' or of its sides timed by the stage; stages nest, e.g. match includes emit
+# book_update is every change of a book side: resting, amending, removing an order and the sweep of a match,
+# emit is publishing of single trade, output is the end of every submit, cancel and amend
+BOOK_STAGES = {
+    "validate": ("validateQuery",),
+    "match": ("rebalanceOrderBook",),
+    "book_update": tuple(f"{side}.{method}" for side in ("buy_side", "sell_side")
+                         for method in ("addOrder", "amendOrder", "removeOrder", "sweep")),
+    "emit": ("uploadTransactions",),
+    "output": ("eventProcessed",),
+}
+PROFILE_MODES = ("cprofile", "tracemalloc")
+
+
+class LatencyHistogram:
+
+    __slots__ = ("sub_bucket_bits", "buckets", "count", "total", "min", "max")
+
+    def __init__(self, sub_bucket_bits: int = 5) -> None:
+        """__init__
+        Description
+        -----------
+        HDR style histogram of latencies in nanoseconds. Values are kept in log-linear buckets:
+        every power of two is split into 2 ** (sub_bucket_bits - 1) equal buckets, so relative
+        error of reported values is bounded by 2 ** (1 - sub_bucket_bits) whatever the range is.
+
+        Parameters
+        ----------
+        sub_bucket_bits : int
+            Precision of the histogram, 5 bits give error below 6.25%.
+        """
+        self.sub_bucket_bits = sub_bucket_bits
+        # bucket key -> count, key grows with the value
+        self.buckets = {}
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = 0
+
+    def bucketKey(self, value: int) -> int:
+        shift = max(value.bit_length() - self.sub_bucket_bits, 0)
+        return (shift << self.sub_bucket_bits) | (value >> shift)
+
+    def bucketUpperBound(self, key: int) -> int:
+        """bucketUpperBound
+        Description
+        -----------
+        Highest value that falls into the bucket.
+        """
+        shift = key >> self.sub_bucket_bits
+        mantissa = key & ((1 << self.sub_bucket_bits) - 1)
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        key = self.bucketKey(value)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        self.count += 1
+        self.total += value
+        if self.min is None or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q: float) -> int:
+        """percentile
+        Description
+        -----------
+        Upper bound of the bucket holding q-th percentile, 0 if nothing has been recorded.
+        """
+        if not self.count:
+            return 0
+        rank = max(int(self.count * q / 100 + 0.5), 1)
+        seen = 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen >= rank:
+                return min(self.bucketUpperBound(key), self.max)
+        return self.max
+
+    def cumulativeBuckets(self) -> Iterator[Tuple[int, int]]:
+        """cumulativeBuckets
+        Description
+        -----------
+        (upper bound, number of values not greater than the bound) for every non empty bucket.
+        """
+        seen = 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            yield self.bucketUpperBound(key), seen
+
+
+class Instrumentation:
+
+    def __init__(self, sub_bucket_bits: int = 5) -> None:
+        """__init__
+        Description
+        -----------
+        Counters, timers and latency histograms of stages of order processing. Nothing is
+        measured unless the object is attached: 'attach' replaces methods of a single 'OrderBook'
+        with timed ones and 'timedStream' wraps the stream of orders, so a book created without
+        instrumentation runs the plain code.
+
+        Parameters
+        ----------
+        sub_bucket_bits : int
+            Precision of latency histograms, see 'LatencyHistogram'.
+        """
+        self._sub_bucket_bits = sub_bucket_bits
+        # stage -> LatencyHistogram, kept in order of first use
+        self.stages = {}
+
+    def stage(self, name: str) -> LatencyHistogram:
+        histogram = self.stages.get(name)
+        if histogram is None:
+            histogram = self.stages[name] = LatencyHistogram(self._sub_bucket_bits)
+        return histogram
+
+    # ------------------
+    # Region: Timers
+    # ------------------
+    def timed(self, name: str, function):
+        """timed
+        Description
+        -----------
+        Wrap function, every call is counted and timed by the stage.
+
+        Parameters
+        ----------
+        name : str
+            Name of the stage.
+        function : callable
+            Function to be timed.
+
+        Returns
+        -------
+        callable
+        """
+        record = self.stage(name).record
+        clock = time.perf_counter_ns
+
+        def wrapper(*args, **kwargs):
+            start = clock()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                record(clock() - start)
+        return wrapper
+
+    def timedStream(self, name: str, stream: Iterable) -> Iterator:
+        """timedStream
+        Description
+        -----------
+        Iterate over stream of orders, time spent on reading and decoding every item is
+        recorded by the stage.
+        """
+        return self._timedIterator(self.stage(name).record, iter(stream))
+
+    @staticmethod
+    def _timedIterator(record, iterator: Iterator) -> Iterator:
+        clock = time.perf_counter_ns
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            record(clock() - start)
+            yield item
+
+    def attach(self, order_book) -> None:
+        """attach
+        Description
+        -----------
+        Time stages of the book, see 'BOOK_STAGES'. Methods are replaced on the book and its sides only,
+        other books are not affected.
+
+        Parameters
+        ----------
+        order_book : OrderBook
+            Instrumented book.
+        """
+        for name, methods in BOOK_STAGES.items():
+            for method in methods:
+                owner, _, attribute = method.rpartition(".")
+                target = getattr(order_book, owner) if owner else order_book
+                setattr(target, attribute, self.timed(name, getattr(target, attribute)))
+
+    # ------------------
+    # End Region: Timers
+    # ------------------
+
+    # ------------------
+    # Region: Export
+    # ------------------
+    def summary(self) -> HM:
+        """summary
+        Description
+        -----------
+        Counters, total time and latency percentiles of every stage, times in nanoseconds.
+        """
+        return {name: {"count": h.count, "total_ns": h.total, "min_ns": h.min or 0, "max_ns": h.max,
+                       "p50_ns": h.percentile(50), "p90_ns": h.percentile(90), "p99_ns": h.percentile(99),
+                       "p99.9_ns": h.percentile(99.9)}
+                for name, h in self.stages.items()}
+
+    def toJson(self) -> str:
+        return json.dumps(self.summary(), indent=2)
+
+    def toPrometheus(self, prefix: str = "orderbook") -> str:
+        """toPrometheus
+        Description
+        -----------
+        Stages in Prometheus text exposition format, latency histograms in seconds.
+        """
+        lines = [f"# TYPE {prefix}_stage_latency_seconds histogram"]
+        for name, h in self.stages.items():
+            for bound, seen in h.cumulativeBuckets():
+                lines.append(f'{prefix}_stage_latency_seconds_bucket{{stage="{name}",le="{bound / 1e9:.9f}"}} {seen}')
+            lines.append(f'{prefix}_stage_latency_seconds_bucket{{stage="{name}",le="+Inf"}} {h.count}')
+            lines.append(f'{prefix}_stage_latency_seconds_sum{{stage="{name}"}} {h.total / 1e9:.9f}')
+            lines.append(f'{prefix}_stage_latency_seconds_count{{stage="{name}"}} {h.count}')
+        return "\n".join(lines) + "\n"
+
+    # ------------------
+    # End Region: Export
+    # ------------------
+
+
+class Profiler:
+
+    def __init__(self, mode: str, output_file, top: int = 30) -> None:
+        """__init__
+        Description
+        -----------
+        Context manager capturing the whole run with cProfile or tracemalloc.
+
+        Parameters
+        ----------
+        mode : str
+            'cprofile' dumps pstats file readable with 'pstats' or snakeviz,
+            'tracemalloc' writes 'top' lines allocating the most memory.
+        output_file : str
+            Destination of the capture.
+        top : int
+            Number of lines in tracemalloc report.
+        """
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Profile mode might be only one of {list(PROFILE_MODES)}.")
+        self._mode = mode
+        self._output_file = output_file
+        self._top = top
+        self._profile = None
+
+    def __enter__(self):
+        if self._mode == "cprofile":
+            self._profile = cProfile.Profile()
+            self._profile.enable()
+        else:
+            tracemalloc.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        if self._mode == "cprofile":
+            self._profile.disable()
+            self._profile.dump_stats(self._output_file)
+            return
+        snapshot = tracemalloc.take_snapshot()
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        with open(self._output_file, "w") as f:
+            f.write(f"peak traced memory: {peak} B\n")
+            for stat in snapshot.statistics("lineno")[:self._top]:
+                f.write(f"{stat}\n")
+
+    @staticmethod
+    def printStats(stats_file, top: int = 30) -> None:
+        """printStats
+        Description
+        -----------
+        Print functions with the highest cumulative time from cProfile capture.
+        """
+        pstats.Stats(stats_file).sort_stats("cumulative").print_stats(top)
@@ -0,0 +1,206 @@
+from typing import TypeVar, Iterable, Tuple, Dict, List
+from bisect import bisect_left, bisect_right
+
+HM = TypeVar("HM", bound=Dict)
+
+
+class DepthSide:
+
+    def __init__(self, direction: str) -> None:
+        """__init__
+        Description
+        -----------
+        Aggregated volume per price of one side of the book. Level keys are kept in a sorted list
+        with the best price at the end, as in 'PriceLevelBookSide'.
+
+        Parameters
+        ----------
+        direction : str
+            'Buy' or 'Sell'.
+        """
+        self.direction = direction
+        # price -> published volume
+        self.volumes = {}
+        # ascending list of level keys, best level is the last one
+        self.keys = []
+
+    def priceKey(self, price: int) -> int:
+        return price if self.direction == "Buy" else -price
+
+    def rankOf(self, price: int) -> int:
+        """rankOf
+        Description
+        -----------
+        Number of levels with better price than 'price', 0 for the best level.
+        """
+        return len(self.keys) - bisect_right(self.keys, self.priceKey(price))
+
+    def change(self, price: int, volume: int) -> None:
+        """change
+        Description
+        -----------
+        Add volume, negative for removal, to the level. Level is created or dropped when needed.
+        """
+        total = self.volumes.get(price, 0) + volume
+        if total > 0:
+            if price not in self.volumes:
+                key = self.priceKey(price)
+                self.keys.insert(bisect_left(self.keys, key), key)
+            self.volumes[price] = total
+        elif price in self.volumes:
+            del self.volumes[price]
+            key = self.priceKey(price)
+            if self.keys[-1] == key:
+                self.keys.pop()
+            else:
+                del self.keys[bisect_left(self.keys, key)]
+
+    def best(self) -> Tuple[int, int]:
+        if not self.keys:
+            return None
+        price = self.keys[-1] if self.direction == "Buy" else -self.keys[-1]
+        return price, self.volumes[price]
+
+    def top(self, n: int) -> List[Tuple[int, int]]:
+        if n <= 0:
+            return []
+        volumes = self.volumes
+        if self.direction == "Buy":
+            return [(key, volumes[key]) for key in self.keys[:-n - 1:-1]]
+        return [(-key, volumes[-key]) for key in self.keys[:-n - 1:-1]]
+
+
+class MarketView:
+
+    def __init__(self) -> None:
+        """__init__
+        Description
+        -----------
+        Cached top of the book (L1) with the last trade and depth per price (L2), updated incrementally
+        from events of 'OrderBook', passed with 'OrderBook(..., market_view=view)'. Volume is the published one,
+        Iceberg orders count with their visible quantity. Best price is read in constant time,
+        'depth(n)' in O(n). Subscribers are notified at the end of an event, only when the top n
+        levels they watch have changed.
+        """
+        self.bids = DepthSide("Buy")
+        self.asks = DepthSide("Sell")
+        # id -> (side, price, published volume) of resting orders
+        self._orders = {}
+        # best rank touched on any side during current event, None if the book was not touched
+        self._touched = None
+        # [callback, levels, last depth sent]
+        self._subscribers = []
+        self.last_trade = None
+
+    # ------------------
+    # Region: Queries
+    # ------------------
+    def bestBid(self) -> Tuple[int, int]:
+        """bestBid
+        Description
+        -----------
+        (price, volume) of the best buy level, None if there are no buy orders.
+        """
+        return self.bids.best()
+
+    def bestAsk(self) -> Tuple[int, int]:
+        """bestAsk
+        Description
+        -----------
+        (price, volume) of the best sell level, None if there are no sell orders.
+        """
+        return self.asks.best()
+
+    def spread(self) -> int:
+        """spread
+        Description
+        -----------
+        Best ask minus best bid, None if any side is empty.
+        """
+        if not self.bids.keys or not self.asks.keys:
+            return None
+        return -self.asks.keys[-1] - self.bids.keys[-1]
+
+    def depth(self, n: int) -> HM:
+        """depth
+        Description
+        -----------
+        Top 'n' levels of both sides from the best price.
+
+        Returns
+        -------
+        HM
+            {"bids": [(price, volume), ...], "asks": [(price, volume), ...]}
+        """
+        return {"bids": self.bids.top(n), "asks": self.asks.top(n)}
+
+    # ------------------
+    # End Region: Queries
+    # ------------------
+
+    def subscribe(self, callback, levels: int = 1) -> None:
+        """subscribe
+        Description
+        -----------
+        Call 'callback(depth)' whenever top 'levels' levels of any side change, see 'depth'.
+        """
+        if levels <= 0:
+            raise ValueError("Number of levels must be positive.")
+        self._subscribers.append([callback, levels, self.depth(levels)])
+
+    # ------------------
+    # Region: Book events
+    # ------------------
+    def sideOf(self, direction: str) -> DepthSide:
+        return self.bids if direction == "Buy" else self.asks
+
+    def touch(self, side: DepthSide, price: int) -> None:
+        if self._subscribers:
+            rank = side.rankOf(price)
+            if self._touched is None or rank < self._touched:
+                self._touched = rank
+
+    def orderAdded(self, order) -> None:
+        side = self.sideOf(order.direction)
+        self._orders[order.id] = (side, order.price, order.visible_quantity)
+        side.change(order.price, order.visible_quantity)
+        self.touch(side, order.price)
+
+    def orderModified(self, order) -> None:
+        side, price, volume = self._orders[order.id]
+        if volume != order.visible_quantity:
+            self._orders[order.id] = (side, price, order.visible_quantity)
+            side.change(price, order.visible_quantity - volume)
+            self.touch(side, price)
+
+    def orderRemoved(self, order) -> None:
+        item = self._orders.pop(order.id, None)
+        if item is not None:
+            side, price, volume = item
+            self.touch(side, price)
+            side.change(price, -volume)
+
+    def tradeMade(self, trade) -> None:
+        self.last_trade = trade
+
+    def eventProcessed(self) -> None:
+        """eventProcessed
+        Description
+        -----------
+        End of the event. Subscribers watching levels touched by the event get new depth if it differs from the last one they got.
+        """
+        best_touched = self._touched
+        if best_touched is None:
+            return
+        self._touched = None
+        for subscriber in self._subscribers:
+            callback, levels, last = subscriber
+            if best_touched < levels:
+                depth = self.depth(levels)
+                if depth != last:
+                    subscriber[2] = depth
+                    callback(depth)
+
+    # ------------------
+    # End Region: Book events
+    # ------------------
@@ -0,0 +1,96 @@
+from flash.order_book.OrderProcessing import OrderHandler
+from typing import TypeVar, Iterable, Tuple, Dict, List
+import json
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+HM = TypeVar("HM", bound=Dict)
+
+# pieces of the json grammar, so the scanner accepts exactly what 'json' and 'orjson' accept:
+# json whitespace only, string without escapes nor control characters, integer without leading zeros
+WHITESPACE = r"[ \t\n\r]*"
+STRING = r'"([^"\\\x00-\x1f]*)"'
+INTEGER = r"(-?(?:0|[1-9][0-9]*))"
+# {"type":..,"order":{"direction":..,"id":..,"price":..,"quantity":..[,"peak":..]}} with integer numbers, whitespace allowed
+ORDER_PATTERN = re.compile(
+    (r'_\{_"type"_:_S_,_"order"_:_\{_"direction"_:_S_,'
+     r'_"id"_:_I_,_"price"_:_I_,_"quantity"_:_I_(?:,_"peak"_:_I_)?\}_\}_')
+    .replace("_", WHITESPACE).replace("S", STRING).replace("I", INTEGER))
+
+
+class OrderDecoder:
+
+    @staticmethod
+    def decodeOrder(line) -> OrderHandler:
+        """decodeOrder
+        Description
+        -----------
+        Decode single line of the order stream straight into order object.
+        'orjson' is used if it is installed, otherwise lines are scanned with 'decodeWithScanner'.
+
+        Parameters
+        ----------
+        line : str
+            Single order in json format.
+
+        Returns
+        -------
+        OrderHandler
+        """
+        if orjson is not None:
+            return OrderDecoder.decodeFromMap(orjson.loads(line))
+        return OrderDecoder.decodeWithScanner(line)
+
+    @staticmethod
+    def decodeWithScanner(line: str) -> OrderHandler:
+        """decodeWithScanner
+        Description
+        -----------
+        Lines in the fixed wire format are scanned with one regular expression, no hash maps are built.
+        Any other line, e.g. with different key order, float price or symbol, goes through 'json'.
+
+        Parameters
+        ----------
+        line : str
+            Single order in json format.
+
+        Returns
+        -------
+        OrderHandler
+        """
+        match = ORDER_PATTERN.fullmatch(line)
+        if match is None:
+            return OrderDecoder.decodeFromMap(json.loads(line))
+        type_, direction, id_, price, quantity, peak = match.groups()
+        if type_ != "Iceberg":
+            peak = None
+        elif peak is None:
+            return OrderDecoder.decodeFromMap(json.loads(line))
+        else:
+            peak = int(peak)
+        return OrderHandler.fromFields(type_, direction, int(id_), int(price), int(quantity), peak)
+
+    @staticmethod
+    def decodeFromMap(signal: HM) -> OrderHandler:
+        """decodeFromMap
+        Description
+        -----------
+        Build order from already decoded hash map, same as 'OrderHandler.unpackRequest' but without storing the map.
+
+        Parameters
+        ----------
+        signal : HM
+            Single order in the input format.
+
+        Returns
+        -------
+        OrderHandler
+        """
+        order = signal["order"]
+        return OrderHandler.fromFields(signal["type"], order["direction"], order["id"], order["price"],
+                                       order["quantity"], order["peak"] if signal["type"] == "Iceberg" else None,
+                                       order.get("symbol"))
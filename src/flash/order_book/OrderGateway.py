@@ -0,0 +1,301 @@
+from flash.order_book.OrderProcessing import OrderBook, OrderHandler
+from flash.order_book.OrderDecoder import OrderDecoder
+from flash.order_book.OutputWriter import OutputWriter
+from flash.order_book.TradeSink import NullTradeSink
+from typing import TypeVar, Iterable, Tuple, Dict, List
+import argparse
+import asyncio
+import json
+
+HM = TypeVar("HM", bound=Dict)
+
+# reason of rejects of orders not matched because the gateway is stopping
+STOPPING = "Gateway is stopping."
+
+
+class Connection:
+
+    def __init__(self, writer: asyncio.StreamWriter, queue_size: int) -> None:
+        """__init__
+        Description
+        -----------
+        Client of the gateway. Messages for the client wait in a bounded queue and are written by
+        a separate task, so slow client never stalls matching. Client that lets the queue overflow
+        is disconnected. None put in the queue closes the connection once earlier messages are written.
+
+        Parameters
+        ----------
+        writer : asyncio.StreamWriter
+            Outgoing half of the connection.
+        queue_size : int
+            Number of messages waiting for the client.
+        """
+        self.writer = writer
+        self.outbox = asyncio.Queue(queue_size)
+        self.closed = False
+        # ids of resting orders of the client
+        self.order_ids = set()
+        self.sender = asyncio.get_running_loop().create_task(self.sendMessages())
+
+    def send(self, message: HM) -> None:
+        if self.closed:
+            return
+        try:
+            self.outbox.put_nowait(message)
+        except asyncio.QueueFull:
+            self.close()
+
+    async def sendMessages(self) -> None:
+        try:
+            while True:
+                message = await self.outbox.get()
+                if message is None:
+                    await self.writer.drain()
+                    break
+                self.writer.write(json.dumps(message, separators=(",", ":")).encode() + b"\n")
+                if self.outbox.empty():
+                    await self.writer.drain()
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        if not self.closed:
+            self.closed = True
+            self.sender.cancel()
+            self.writer.close()
+
+
+class OrderGateway:
+
+    def __init__(self, order_book: OrderBook = None, queue_size: int = 10000, outbox_size: int = 100000,
+                 batch_size: int = 256) -> None:
+        """__init__
+        Description
+        -----------
+        asyncio gateway in front of a single order book. Clients send orders in the input format,
+        one json per line. Every connection decodes its own lines and puts orders into one bounded
+        queue, when the queue is full reading from clients stops, so the backpressure reaches them
+        through the socket. Single matching task takes orders from the queue and pushes back to
+        their owners:
+        {"event":"ack","id":..} when order is accepted,
+        {"event":"reject","id":..,"reason":..} when order is invalid,
+        {"event":"fill","id":..,"counterpartyId":..,"price":..,"quantity":..} for every trade, to both sides.
+
+        Parameters
+        ----------
+        order_book : OrderBook
+            Book behind the gateway. By default new book that keeps no output nor transactions.
+        queue_size : int
+            Number of orders waiting for matching.
+        outbox_size : int
+            Number of messages waiting for a single client before it is disconnected.
+        batch_size : int
+            Number of orders matched before the matching task lets connections run.
+        """
+        self.order_book = order_book if order_book is not None else OrderBook(
+            output=OutputWriter(), trade_sink=NullTradeSink(batch_size=4096))
+        self._queue_size = queue_size
+        self._outbox_size = outbox_size
+        self._batch_size = batch_size
+        self._queue = None
+        self._matcher = None
+        self._servers = []
+        # id of resting order -> connection of its owner
+        self._owners = {}
+        self._connections = set()
+        self._readers = set()
+
+    # ------------------
+    # Region: Server
+    # ------------------
+    async def start(self, host: str = None, port: int = None, path: str = None) -> None:
+        """start
+        Description
+        -----------
+        Start matching task and listen on TCP 'host':'port' and/or unix socket 'path'.
+        """
+        if port is None and path is None:
+            raise ValueError("Gateway needs TCP port or unix socket path.")
+        self._queue = asyncio.Queue(self._queue_size)
+        self._matcher = asyncio.get_running_loop().create_task(self.matchOrders())
+        if port is not None:
+            self._servers.append(await asyncio.start_server(self.handleClient, host, port))
+        if path is not None:
+            self._servers.append(await asyncio.start_unix_server(self.handleClient, path))
+
+    def sockets(self) -> List:
+        return [socket for server in self._servers for socket in server.sockets]
+
+    async def stop(self, timeout: float = 5.0) -> None:
+        """stop
+        Description
+        -----------
+        Stop listening and reading from clients, answer every order already queued, then close all
+        connections once the answers are written. Order left in the queue is rejected explicitly.
+        Connection that does not take its answers within 'timeout' seconds is closed anyway.
+        """
+        for server in self._servers:
+            server.close()
+            await server.wait_closed()
+        readers = list(self._readers)
+        for reader in readers:
+            reader.cancel()
+        await asyncio.gather(*readers, return_exceptions=True)
+        # nothing is queued anymore, so the matching task answers the rest and is not needed after that
+        await self._queue.join()
+        self._matcher.cancel()
+        while not self._queue.empty():
+            order, connection = self._queue.get_nowait()
+            if order is not None:
+                connection.send({"event": "reject", "id": order.id, "reason": STOPPING})
+            self._queue.task_done()
+        connections = list(self._connections)
+        for connection in connections:
+            connection.send(None)
+        if connections:
+            await asyncio.wait([connection.sender for connection in connections], timeout=timeout)
+        for connection in connections:
+            connection.close()
+
+    async def serveForever(self, host: str = None, port: int = None, path: str = None) -> None:
+        await self.start(host=host, port=port, path=path)
+        await asyncio.gather(*(server.serve_forever() for server in self._servers))
+
+    # ------------------
+    # End Region: Server
+    # ------------------
+
+    # ------------------
+    # Region: Ingestion and matching
+    # ------------------
+    async def handleClient(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """handleClient
+        Description
+        -----------
+        Read orders of single client. Lines are decoded here, not in the matching task.
+        """
+        connection = Connection(writer, self._outbox_size)
+        self._connections.add(connection)
+        connection.sender.add_done_callback(lambda _: self.forgetConnection(connection))
+        reader_task = asyncio.current_task()
+        self._readers.add(reader_task)
+        decode = OrderDecoder.decodeOrder
+        order = None
+        try:
+            while not connection.closed:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                try:
+                    order = decode(line.decode())
+                except Exception as e:
+                    connection.send({"event": "reject", "id": None, "reason": f"Cannot decode order: {e}"})
+                    continue
+                await self._queue.put((order, connection))
+                order = None
+            # connection is closed by the matching task, after answers to all queued orders
+            if not connection.closed:
+                await self._queue.put((None, connection))
+        except ConnectionError:
+            pass
+        except asyncio.CancelledError:
+            # gateway is stopping, order read but not queued yet is not left without answer
+            if order is not None:
+                connection.send({"event": "reject", "id": order.id, "reason": STOPPING})
+        finally:
+            self._readers.discard(reader_task)
+
+    def forgetConnection(self, connection: Connection) -> None:
+        """forgetConnection
+        Description
+        -----------
+        Drop closed connection. Its resting orders stay in the book, their fills have no one to be sent to.
+        """
+        self._connections.discard(connection)
+        owners = self._owners
+        for order_id in connection.order_ids:
+            if owners.get(order_id) is connection:
+                del owners[order_id]
+        connection.order_ids.clear()
+
+    async def matchOrders(self) -> None:
+        """matchOrders
+        Description
+        -----------
+        The only task that touches the book. Orders are matched in the order they were queued.
+        """
+        queue = self._queue
+        while True:
+            order, connection = await queue.get()
+            self.matchOrder(order, connection)
+            queue.task_done()
+            # queue.get does not suspend while there are orders, so the loop is given back every batch
+            for _ in range(self._batch_size - 1):
+                if queue.empty():
+                    break
+                order, connection = queue.get_nowait()
+                self.matchOrder(order, connection)
+                queue.task_done()
+            await asyncio.sleep(0)
+
+    def matchOrder(self, order: OrderHandler, connection: Connection) -> None:
+        """matchOrder
+        Description
+        -----------
+        Pass single order through the book, send ack or reject to its owner and fills to both sides of every trade.
+        Any error of the order is sent back as its reject, so a single bad order never stops the matching task.
+        Order None marks the end of the connection.
+        """
+        if order is None:
+            connection.send(None)
+            return
+        try:
+            trades = self.order_book.submit(order)
+        except ValueError as e:
+            connection.send({"event": "reject", "id": order.id, "reason": str(e)})
+            return
+        except Exception as e:
+            connection.send({"event": "reject", "id": order.id, "reason": f"{type(e).__name__}: {e}"})
+            return
+        connection.send({"event": "ack", "id": order.id})
+        owners = self._owners
+        book = self.order_book
+        for trade in trades:
+            for own_id, counterparty_id in ((trade.buyOrderId, trade.sellOrderId),
+                                            (trade.sellOrderId, trade.buyOrderId)):
+                owner = connection if own_id == order.id else owners.get(own_id)
+                if owner is not None:
+                    owner.send({"event": "fill", "id": own_id, "counterpartyId": counterparty_id,
+                                "price": trade.price, "quantity": trade.quantity})
+            resting_id = trade.sellOrderId if trade.buyOrderId == order.id else trade.buyOrderId
+            if book.findOrder(resting_id) is None:
+                owner = owners.pop(resting_id, None)
+                if owner is not None:
+                    owner.order_ids.discard(resting_id)
+        if order.quantity > 0 and not connection.closed:
+            owners[order.id] = connection
+            connection.order_ids.add(order.id)
+
+    # ------------------
+    # End Region: Ingestion and matching
+    # ------------------
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Order gateway, orders in the input format one per line.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--unix", default=None, help="Path of unix socket.")
+    parser.add_argument("--queue-size", type=int, default=10000, help="Number of orders waiting for matching.")
+    args = parser.parse_args()
+    if args.port is None and args.unix is None:
+        parser.error("--port or --unix is required.")
+    gateway = OrderGateway(queue_size=args.queue_size)
+    try:
+        asyncio.run(gateway.serveForever(host=args.host, port=args.port, path=args.unix))
+    except KeyboardInterrupt:
+        pass
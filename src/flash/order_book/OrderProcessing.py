@@ -1,19 +1,27 @@
 from flash.python_tool_kit.IOToolKit import IOToolKit
-from typing import TypeVar, Iterable, Tuple, Dict, List
+from flash.order_book.BookSides import BOOK_SIDES
+from flash.order_book.OutputWriter import OutputWriter, SnapshotWriter
+from flash.order_book.TradeSink import TradeSink
+from flash.order_book.Instrumentation import Instrumentation
+from flash.order_book.MarketView import MarketView
+from typing import TypeVar, Iterable, Tuple, Dict, List, NamedTuple
 import os
-import heapq as h
-from collections import deque 
+import time
 
 HM = TypeVar("HM", bound=Dict)
 
 
 class OrderHandler():
 
+    # orders are kept by millions in the book, so there is no per instance __dict__
+    __slots__ = ("type", "direction", "id", "price", "quantity", "peak", "visible_quantity", "timestamp", "symbol")
+
     def __init__(self, signal: HM) -> None:
         """__init__ 
         Description
         -----------
         Class that handles order object in abstract form.
+        The object is mutated in place when the order is filled or amended.
 
         Parameters
         ----------
@@ -21,18 +29,56 @@ class OrderHandler():
             Single order that went through system's gate.
         """
 
-        self._signal = signal
-
         self.type = None
         self.direction = None
         self.id = None
         self.price = None
         self.quantity = None
         self.peak = None
+        self.symbol = None
+
+        self.unpackRequest(signal=signal)
 
-        self.unpackRequest(signal=self._signal)
+        self.visible_quantity = self.quantity if self.peak is None else min(self.peak, self.quantity)
+        self.timestamp = time.time_ns()
+
+    @classmethod
+    def fromFields(cls, type: str, direction: str, id: int, price: int, quantity: int, peak: int = None,
+                   symbol: str = None):
+        """fromFields
+        Description
+        -----------
+        Build order straight from its attributes, without the intermediate signal hash map.
 
-        self.order_label = self.orderToDisplay()
+        Parameters
+        ----------
+        type : str
+            'Limit' or 'Iceberg'.
+        direction : str
+            'Buy' or 'Sell'.
+        id : int
+        price : int
+        quantity : int
+        peak : int
+            Peak of Iceberg order, None for Limit order.
+        symbol : str
+            Instrument of the order, None if the stream has a single instrument.
+
+        Returns
+        -------
+        OrderHandler
+        """
+        order = cls.__new__(cls)
+        order.type = type
+        order.direction = direction
+        order.id = id
+        order.price = price
+        order.quantity = quantity
+        order.peak = peak
+        order.visible_quantity = quantity if peak is None else min(peak, quantity)
+        order.timestamp = time.time_ns()
+        order.symbol = symbol
+        return order
 
     def unpackRequest(self, signal: str) -> None:
         """unpackRequest
@@ -57,6 +103,7 @@ class OrderHandler():
         self.quantity = signal["order"]["quantity"]
         if signal['type'] == "Iceberg":
             self.peak = signal["order"]['peak']
+        self.symbol = signal["order"].get("symbol")
         return self
 
     def __lt__(self, other) -> bool:
@@ -97,7 +144,7 @@ class OrderHandler():
 
     def orderToDisplay(self) -> HM:
         """orderToDisplay
-        This method casts trades parameters on hash map. 
+        This method casts trades parameters on hash map. Iceberg order shows only its visible peak.
 
         Returns
         -------
@@ -105,11 +152,14 @@ class OrderHandler():
             HM required to display.
         """
 
-        return {"id": self.id, "price": self.price, "quantity": self.quantity}
+        return {"id": self.id, "price": self.price, "quantity": self.visible_quantity}
 
     def updateQuantity(self, sub_quantity: int):
         """updateQuantity
-        This function downgrades quantity volume after making a deal.
+        This function downgrades quantity volume after making a deal. Order is updated in place.
+        Iceberg order is split into visible peak and hidden volume. Once the visible part is consumed
+        the next peak is shown from hidden volume and the order keeps its place in the queue,
+        so a deal of any size is accounted in one step instead of one step per peak.
 
         Parameters
         ----------
@@ -122,30 +172,33 @@ class OrderHandler():
         OrderHandler
             Object with update quantity.
         """
-        if self.type == "Iceberg":
-            signal = {
-                "type": self.type,
-                "order": {
-                    "direction": self.direction,
-                    "id": self.id,
-                    "price": self.price,
-                    "quantity": self.quantity - sub_quantity,
-                    "peak":self.peak
-                }
-            }
-            
-        elif self.type == "Limit":
-            signal = {
-                "type": self.type,
-                "order": {
-                    "direction": self.direction,
-                    "id": self.id,
-                    "price": self.price,
-                    "quantity": self.quantity - sub_quantity
-                }
-            }
+        self.quantity -= sub_quantity
+        if self.peak is None:
+            self.visible_quantity = self.quantity
+        elif sub_quantity < self.visible_quantity:
+            self.visible_quantity -= sub_quantity
+        else:
+            # volume taken beyond the visible part consumes whole peaks and part of the last one
+            self.visible_quantity = min(self.peak - (sub_quantity - self.visible_quantity) % self.peak, self.quantity)
+        return self
 
-        return self.__class__(signal)
+    def setQuantity(self, quantity: int):
+        """setQuantity
+        This function sets new total volume of the order, e.g. after amend.
+
+        Parameters
+        ----------
+        quantity : int
+            New quantity.
+
+        Returns
+        -------
+        OrderHandler
+            Object with update quantity.
+        """
+        self.quantity = quantity
+        self.visible_quantity = quantity if self.peak is None else min(self.peak, quantity)
+        return self
 
     def __str__(self) -> str:
         """__str__
@@ -164,60 +217,303 @@ class OrderHandler():
             return f'Order type is "{self.type}". Order direction is "{self.direction}" . This order has following attributes: id:{self.id}, price:{self.price}, quantity:{self.quantity}, peak:{self.peak}'
 
 
+class Trade(NamedTuple):
+    """Trade
+    Description
+    -----------
+    Single transaction between buy and sell order. '_asdict' gives the record in output format.
+    """
+    buyOrderId: int
+    sellOrderId: int
+    price: int
+    quantity: int
+
+
 class OrderBook:
 
-    def __init__(self, incoming_orders: HM) -> None:
+    def __init__(self, incoming_orders: Iterable[HM] = None, book_type: str = "price_level", book_options: HM = None,
+                 output: OutputWriter = None, trade_sink: TradeSink = None,
+                 instrumentation: Instrumentation = None, journal=None, market_view: MarketView = None) -> None:
         """__init__
         Description
         -----------
         Class for processing new trade and set new trade status.
+        Book lives as long as the object, orders might be fed with 'submit', 'cancel' and 'amend'.
 
         Parameters
         ----------
-        incoming_orders : HM
-            Hash Map of hash maps that represents flow of trades.
+        incoming_orders : Iterable[HM]
+            Hash Map of hash maps that represents flow of trades, or any iterable of orders,
+            e.g. generator from 'IOToolKit.streamInputFile'. Orders are matched as they arrive.
+            If not given, orders are fed one by one with 'submit'.
+        book_type : str
+            Backend used to keep resting orders, 'price_level' (price levels with FIFO queues)
+            'heap' (heaps prioritised by price and id) or 'tick_ladder' (preallocated slots of a price band).
+        book_options : HM
+            Arguments of the backend, e.g. {"min_price": 9000, "max_price": 11000, "tick": 5} for 'tick_ladder'.
+        output : OutputWriter
+            Writer of book events, see 'OutputWriter.OUTPUT_MODES'. By default full status
+            of the book is printed after every event and transactions at the end of the stream.
+        trade_sink : TradeSink
+            Destination of trades, see 'TradeSink.TRADE_FORMATS'. Trades are passed to the sink
+            as they happen and are not kept by the book. If not given, trades are collected and
+            written by 'output' at the end of the stream.
+        instrumentation : Instrumentation
+            If given then stages of processing are counted and timed, see 'Instrumentation.BOOK_STAGES'.
+            Without it the book runs no measuring code at all.
+        journal : BookStore
+            If given then accepted orders, cancels, amends and trades are journaled and the book is
+            snapshotted periodically, see 'BookStore'. Previous content of the store is dropped,
+            book is restarted from the store with 'BookStore.recover'.
+        market_view : MarketView
+            If given then it is kept up to date with best prices and depth of the book.
         """
 
-        self._incoming_orders = incoming_orders
-
-        self.asks_list = []
-        self.bids_list = []
-        self._orders_status = {"buyOrders": [], "sellOrders": []}
+        if book_type not in BOOK_SIDES:
+            raise ValueError(f"Book type might be only one of {list(BOOK_SIDES)}.")
+        self.buy_side = BOOK_SIDES[book_type](direction="Buy", **(book_options or {}))
+        self.sell_side = BOOK_SIDES[book_type](direction="Sell", **(book_options or {}))
+        # backends bound to a price grid reject other prices before any deal is made
+        self._accepts_price = getattr(self.buy_side, "acceptsPrice", None)
+        # published status of the book, materialised from the book sides when needed, None if out of date
+        self._orders_status = None
         self._transactions_container = []
+        # trades of the event being processed, returned by 'submit'
+        self._event_trades = []
+        self.attach(output=output, trade_sink=trade_sink, journal=journal, market_view=market_view)
+        if journal is not None:
+            journal.start()
+        if instrumentation is not None:
+            instrumentation.attach(self)
 
         # ------------------
         # Region: Class members
         # ------------------ 
-
-        for incoming_order in incoming_orders.values():
-            _order = OrderHandler(incoming_order)
-            self.validateQuery(incoming_order=_order)
-            self.flowOrderHandle(order=_order)
-            if not self.asks_list or not self.bids_list:
-                self.uploadToOrderStatus(order=_order)
-                print(self._orders_status)
-            elif self.asks_list and self.bids_list:
-               #overwritten_order is an existing order that we would have positive quantity after matching
-               self.updateOrderBookCondition(incoming_order=_order)
-
-        while len(self.asks_list)>0 and len(self.bids_list)>0:
-            max_price,order_id_ask, trade_object_asks = self.asks_list[0]
-            min_price,order_id_bid, trade_object_bids = self.bids_list[0]
-            if abs(max_price)>=min_price:
-
-                self.matchingEngine(trade_object_asks,trade_object_bids)
-            else:
-                break 
-
-
-        print(self._orders_status)
-        if len(self._transactions_container) > 0:
-            for tran in self._transactions_container:
-                print(tran)
+        if incoming_orders is not None:
+            if isinstance(incoming_orders, dict):
+                incoming_orders = incoming_orders.values()
+            try:
+                for incoming_order in incoming_orders:
+                    self.process(incoming_order)
+            finally:
+                # output of orders processed before an invalid one is not lost
+                self._output.flush()
+                if self._trade_sink is not None:
+                    self._trade_sink.flush()
+            self.flushOrderBook()
         # ------------------
         # End Region: Class members
         # ------------------         
 
+    # ------------------
+    # Region: Book API
+    # ------------------
+    def submit(self, incoming_order) -> List[Trade]:
+        """submit
+        Description
+        -----------
+        Pass single order through the gate: validate it, match it against the opposite side
+        and put what is left on the book.
+
+        Parameters
+        ----------
+        incoming_order : HM or OrderHandler
+            Order in the input format, {"type": ..., "order": {...}}.
+
+        Returns
+        -------
+        List[Trade]
+            Transactions made by this order.
+        """
+        _order = incoming_order if isinstance(incoming_order, OrderHandler) else OrderHandler(incoming_order)
+        self.validateQuery(incoming_order=_order)
+        if self._journal is not None:
+            self._journal.orderAccepted(_order)
+        self._event_trades = []
+        self.updateOrderBookCondition(incoming_order=_order)
+        self.eventProcessed()
+        return self._event_trades
+
+    def process(self, incoming_order: HM) -> None:
+        """process
+        Description
+        -----------
+        Feed single order from the stream, see 'submit'.
+
+        Parameters
+        ----------
+        incoming_order : HM
+            Order in the input format, {"type": ..., "order": {...}}.
+        """
+        self.submit(incoming_order)
+
+    def cancel(self, order_id: int) -> OrderHandler:
+        """cancel
+        Description
+        -----------
+        Remove resting order from the book.
+
+        Parameters
+        ----------
+        order_id : int
+            Id of the order.
+
+        Returns
+        -------
+        OrderHandler
+            Cancelled order.
+
+        Raises
+        ------
+        ValueError
+            If there is no such order in the book.
+        """
+        order = self.findOrder(order_id)
+        if order is None:
+            raise ValueError(f"There is no order {order_id} in the book.")
+        if self._journal is not None:
+            self._journal.orderCancelled(order_id)
+        self.sideOf(order.direction).removeOrder(order_id)
+        self.removeOrder(existing_order=order, id_for_remove=order_id)
+        self.eventProcessed()
+        return order
+
+    def amend(self, order_id: int, quantity: int) -> OrderHandler:
+        """amend
+        Description
+        -----------
+        Change volume of resting order. Decreasing volume keeps priority of the order, increasing it puts
+        the order on its side again: 'price_level' and 'tick_ladder' send it to the end of the queue of its
+        price, 'heap' prioritises orders of a price by id, so there the order keeps its place.
+        Zero volume cancels the order.
+
+        Parameters
+        ----------
+        order_id : int
+            Id of the order.
+        quantity : int
+            New total quantity.
+
+        Returns
+        -------
+        OrderHandler
+            Amended order.
+
+        Raises
+        ------
+        ValueError
+            If there is no such order in the book or quantity is negative.
+        """
+        if quantity < 0:
+            raise ValueError("Quantity value cannot be negative!")
+        if quantity == 0:
+            return self.cancel(order_id)
+        order = self.findOrder(order_id)
+        if order is None:
+            raise ValueError(f"There is no order {order_id} in the book.")
+        if self._journal is not None:
+            self._journal.orderAmended(order_id, quantity)
+        side = self.sideOf(order.direction)
+        if quantity <= order.quantity:
+            side.amendOrder(order_id, quantity)
+        else:
+            side.removeOrder(order_id)
+            side.addOrder(order.setQuantity(quantity))
+        self.updateOrderStatus(order=order)
+        self.eventProcessed()
+        return order
+
+    def snapshot(self) -> HM:
+        """snapshot
+        Description
+        -----------
+        Current status of the book in output format. Returned object is a copy.
+
+        Returns
+        -------
+        HM
+            {"buyOrders": [...], "sellOrders": [...]}
+        """
+        return {side: [dict(order) for order in orders] for side, orders in self.ordersStatus().items()}
+
+    def ordersStatus(self) -> HM:
+        """ordersStatus
+        Description
+        -----------
+        Status of the book in output format, orders are listed by priority. Lists are built
+        from the book sides only when the book has changed since the last call.
+        Returned object must not be modified.
+
+        Returns
+        -------
+        HM
+            {"buyOrders": [...], "sellOrders": [...]}
+        """
+        if self._orders_status is None:
+            self._orders_status = {
+                "buyOrders": [order.orderToDisplay() for order in self.buy_side.iterOrders()],
+                "sellOrders": [order.orderToDisplay() for order in self.sell_side.iterOrders()]
+            }
+        return self._orders_status
+
+    def flushOrderBook(self) -> None:
+        """flushOrderBook
+        Description
+        -----------
+        Close the stream and write all outstanding output.
+        """
+        if self._trade_sink is not None:
+            self._trade_sink.close()
+        if self._journal is not None:
+            self._journal.close()
+        self._output.close(self, self._transactions_container)
+
+    def attach(self, output: OutputWriter = None, trade_sink: TradeSink = None, journal=None,
+               market_view: MarketView = None) -> None:
+        """attach
+        Description
+        -----------
+        Set destinations of events of the book, e.g. when a book rebuilt by 'BookStore.recover' goes live.
+        Every destination is replaced, None detaches it. Journal is attached as it is, it is not started
+        from scratch. Market view is loaded with orders already resting in the book.
+
+        Parameters
+        ----------
+        output : OutputWriter
+            Writer of book events, full status of the book after every event if not given.
+        trade_sink : TradeSink
+            Destination of trades, trades are collected for 'output' if not given.
+        journal : BookStore
+            Journal of accepted events.
+        market_view : MarketView
+            View kept up to date with best prices and depth of the book.
+        """
+        self._output = output if output is not None else SnapshotWriter()
+        self._trade_sink = trade_sink
+        self._journal = journal
+        self._market_view = market_view
+        if market_view is not None and (len(self.buy_side) or len(self.sell_side)):
+            for side in (self.buy_side, self.sell_side):
+                for order in side.iterOrders():
+                    market_view.orderAdded(order)
+            market_view.eventProcessed()
+
+    def eventProcessed(self) -> None:
+        """eventProcessed
+        Description
+        -----------
+        End of single event, 'submit', 'cancel' or 'amend'. Output, market view and journal are told the book is consistent again.
+        """
+        self._output.eventProcessed(self)
+        if self._market_view is not None:
+            self._market_view.eventProcessed()
+        if self._journal is not None:
+            self._journal.eventProcessed(self)
+
+    # ------------------
+    # End Region: Book API
+    # ------------------
+
     # ------------------
     # Region: Order check
     # ------------------                
@@ -235,34 +531,49 @@ class OrderBook:
         Raises
         ------
         ValueError
-            
-        ValueError
-            _description_
-        ValueError
-            _description_
+            If type, price, quantity, peak or direction is not valid, price, quantity or peak is not a number,
+            id is not hashable, price is off the grid of 'tick_ladder' book or order with the same id is already in the book.
         """
         if incoming_order.type not in ["Iceberg", "Limit"]:
             raise ValueError(
                 "Type of order might be only 'Iceberg' and 'Limit'.")
-        if incoming_order.price < 0:
-            raise ValueError("Price cannot be negative!")
-        if incoming_order.quantity < 0:
-            raise ValueError("Quantity value cannot be negative!")
-        if incoming_order.direction not in ["Buy", "Sell"]:
-            raise ValueError("Direction might be only 'Buy' or 'Sell'")
+        # fields of wrong type, e.g. price "14", fail the comparisons, so they are rejected before they reach the book
+        try:
+            if incoming_order.type == "Iceberg" and (incoming_order.peak is None or incoming_order.peak <= 0):
+                raise ValueError("Peak of Iceberg order must be positive.")
+            if incoming_order.price < 0:
+                raise ValueError("Price cannot be negative!")
+            if self._accepts_price is not None and not self._accepts_price(incoming_order.price):
+                raise ValueError(f"Price {incoming_order.price} is out of the price band or off the tick grid of the book.")
+            if incoming_order.quantity < 0:
+                raise ValueError("Quantity value cannot be negative!")
+            if incoming_order.direction not in ["Buy", "Sell"]:
+                raise ValueError("Direction might be only 'Buy' or 'Sell'")
+            if incoming_order.id in self.buy_side or incoming_order.id in self.sell_side:
+                raise ValueError(f"Order {incoming_order.id} is already in the book.")
+        except TypeError as e:
+            raise ValueError(f"Invalid type of order field: {e}") from None
 
 
     # ------------------
     # End Region: Order check
     # ------------------            
 
+    def sideOf(self, direction: str):
+        """sideOf
+        Description
+        -----------
+        Side of the book where orders with given direction rest.
+        """
+        return self.buy_side if direction == "Buy" else self.sell_side
+
     def flowOrderHandle(self, order: OrderHandler) -> None:
         """flowOrderHandle
         Description
         -----------
-        This method updates on fly the containers for asks and bids offers.
-        It takes new offer and if this is a 'buy' offer then it puts on the heap,
-        otherwise it puts on mean heap.
+        This method updates on fly the containers for buy and sell offers.
+        New order is put on its side of the book, order already resting in the book
+        gets its volume updated or is removed if there is no volume left.
 
         Parameters
         ----------
@@ -270,36 +581,39 @@ class OrderBook:
             New order which is passing through a gate.
         """
         if order.direction == "Buy":
-            
-            if any(order.id in sub_tuple for sub_tuple in self.asks_list):
-               
-                for _o in self.asks_list:
-                    if _o[1]==order.id and order.quantity!=0:
-                        _o[2].quantity=order.quantity
-                    elif _o[1]==order.id and order.quantity==0:
-                        self.asks_list.remove(_o)
-                        
-
-            else:
-                #new order only push on peak
-                h.heappush(self.asks_list, (-order.price,order.id, order))   
-            # check if this trade, identified by od already exists in heap.
-            #  If so then first remove it and then put on heap with updated quantity.
-        if order.direction == "Sell":
-            if any(order.id in sub_tuple for sub_tuple in self.bids_list):
-                
-                for _o in self.bids_list:
-                    if _o[1]==order.id and order.quantity!=0:
-                        _o[2].quantity=order.quantity
-                    elif _o[1]==order.id and order.quantity==0:
-                        self.bids_list.remove(_o)
-                
-
-            # check if this trade, identified by od already exists in heap.
-            #  If so then first remove it and then put on heap with updated quantity.
-            else:
-                #new order only push on peak
-                h.heappush(self.bids_list, (order.price,order.id, order))
+            side = self.buy_side
+        elif order.direction == "Sell":
+            side = self.sell_side
+        else:
+            return
+
+        if order.id not in side:
+            if order.quantity > 0:
+                side.addOrder(order)
+        elif order.quantity > 0:
+            # existing order keeps its priority, only volume is updated
+            side.amendOrder(order.id, order.quantity)
+        else:
+            side.removeOrder(order.id)
+
+    def findOrder(self, order_id: int) -> OrderHandler:
+        """findOrder
+        Description
+        -----------
+        Look up an order resting in the book by its id.
+
+        Parameters
+        ----------
+        order_id : int
+            Id of the order.
+
+        Returns
+        -------
+        OrderHandler
+            Resting order or None if there is no such order in the book.
+        """
+        order = self.buy_side.findOrder(order_id)
+        return order if order is not None else self.sell_side.findOrder(order_id)
 
     def uploadToOrderStatus(self, order: OrderHandler):
         """uploadToOrderStatus
@@ -312,69 +626,73 @@ class OrderBook:
         order : OrderHandler
             Last order in system, which passed validation test.
         """
-        if len(self._orders_status["sellOrders"])==0 or len(self._orders_status["buyOrders"])==0:
-            if order.direction == "Buy" :
-                    self._orders_status["buyOrders"].append(order.order_label)
-            elif order.direction == "Sell":
-                    self._orders_status["sellOrders"].append(order.order_label)        
-        ids_in_order_book=[]
-        for ex_order in self._orders_status["buyOrders"]+self._orders_status["sellOrders"]:
-            ids_in_order_book.append(ex_order["id"])
-        if order.id not in ids_in_order_book:
-            if order.direction == "Buy" :
-                self._orders_status["buyOrders"].append(order.order_label)
-                
-            elif order.direction == "Sell":
-                self._orders_status["sellOrders"].append(order.order_label)
-        else:
-            for ex_order in self._orders_status["buyOrders"]+self._orders_status["sellOrders"]:
-                if  ex_order["id"]==order.id and ex_order["quantity"]!=order.quantity: 
-                    if order.direction == "Buy":
-                        ex_order["quantity"]=order.quantity
-                    elif order.direction == "Sell":
-                        ex_order["quantity"]=order.quantity
-                else:
-                    continue
-
+        self._orders_status = None
+        self._output.orderAdded(order)
+        if self._market_view is not None:
+            self._market_view.orderAdded(order)
 
+    def updateOrderStatus(self, order: OrderHandler):
+        """updateOrderStatus
+        Description
+        -----------
+        Update volume of the order already displayed in the Order book.
 
-     
-
+        Parameters
+        ----------
+        order : OrderHandler
+            Order resting in the book.
+        """
+        self._orders_status = None
+        self._output.orderModified(order)
+        if self._market_view is not None:
+            self._market_view.orderModified(order)
 
     def updateOrderBookCondition(self, incoming_order: OrderHandler):
         """updateOrderBookCondition
         Description
         -----------
+        Match incoming order against the opposite side of the book and put the remaining
+        volume, if any, on the book.
 
+        Parameters
+        ----------
+        incoming_order : OrderHandler
+            Order which just arrived from client.
+        """
+        incoming_order = self.rebalanceOrderBook(incoming_order=incoming_order)
+        if incoming_order.quantity > 0:
+            self.flowOrderHandle(order=incoming_order)
+            self.uploadToOrderStatus(order=incoming_order)
+
+    def rebalanceOrderBook(self, incoming_order: OrderHandler) -> OrderHandler:
+        """rebalanceOrderBook
+        Description
+        -----------
+        Run deals between incoming order and the best orders on the opposite side as long as prices cross.
+        Opposite side is swept once through all crossing levels, then every deal is published in priority order
+        and the incoming order is updated once with the whole traded volume. Incoming Iceberg order that is
+        left on the book shows a fresh peak.
 
         Parameters
         ----------
         incoming_order : OrderHandler
-            _description_
+            Order which just arrived from client.
+
+        Returns
+        -------
+        OrderHandler
+            Incoming order after all deals.
         """
-        
-        max_price,order_id, trade_object_asks = self.asks_list[0]
-        min_price,order_id, trade_object_bids = self.bids_list[0]
-        
-        if incoming_order.direction == "Buy":
-            if incoming_order.price < min_price:
-                
-                self.uploadToOrderStatus(incoming_order)
-                print(self._orders_status)
-
-            else:
-                 
-                   return self.matchingEngine(incoming_order=incoming_order,
-                                        matched_order=trade_object_bids)
-        elif incoming_order.direction == "Sell":
-            if incoming_order.price > abs(max_price):
-                
-                self.uploadToOrderStatus(incoming_order)
-                print(self._orders_status)
-            else: 
-                
-                    return self.matchingEngine(incoming_order=incoming_order,
-                                               matched_order=trade_object_asks)
+        opposite_side = self.sell_side if incoming_order.direction == "Buy" else self.buy_side
+        fills = opposite_side.sweep(incoming_order.price, incoming_order.quantity)
+        if not fills:
+            return incoming_order
+        traded = 0
+        for matched_order, quantity, visible_quantity in fills:
+            self.matchingEngine(incoming_order=incoming_order, matched_order=matched_order, quantity=quantity,
+                                visible_quantity=visible_quantity)
+            traded += quantity
+        return incoming_order.setQuantity(incoming_order.quantity - traded)
 
     def removeOrder(self, existing_order: OrderHandler,id_for_remove:int):
         """removeOrder
@@ -386,381 +704,99 @@ class OrderBook:
         ----------
         existing_order : OrderHandler
             Order that has been associated with new Order and thus removed from book.
-        Note
-        ----
-        This happen only if volume of two trades are the same.    
+        id_for_remove : int
+            Id of the order.
         """
-        
-        for order in self._orders_status["buyOrders"]+self._orders_status["sellOrders"]:
-            if order["id"]==id_for_remove and existing_order.direction == "Buy":
-                self._orders_status["buyOrders"].remove(order)
-            elif order["id"]==id_for_remove and existing_order.direction == "Sell":
-                    self._orders_status["sellOrders"].remove(order)
-
-
+        self._orders_status = None
+        self._output.orderRemoved(existing_order)
+        if self._market_view is not None:
+            self._market_view.orderRemoved(existing_order)
 
     def matchingEngine(self,
                         incoming_order: OrderHandler,
-                        matched_order: OrderHandler):
+                        matched_order: OrderHandler,
+                        quantity: int,
+                        visible_quantity: int = None) -> None:
         """matchingEngine
         Description
         -----------
-        This function update trade if match on the market happen. If both quantities are equal then we wipe out matched order from the book.
+        This function records deals between new order and the order resting in the book, after the resting
+        order has been filled by the sweep of its side. Deal is made at price of the resting order. Resting Iceberg
+        order trades the part it shows first, then whole peaks shown one after another and the rest, incoming
+        Iceberg order trades at most its peak in one deal. Every deal is a trade of the output, the book is
+        updated once per pair. If matched order has no volume left then we wipe it out from the book.
 
         Parameters
         ----------
         incoming_order : OrderHandler
             New order which just arrived from client.
         matched_order : OrderHandler
-            Order that already exists in the book and deal may happen with the new offer.
+            Order resting in the book, already filled.
+        quantity : int
+            Traded volume.
+        visible_quantity : int
+            Volume the matched order showed before it was filled, its whole volume if not given.
         """
-
-       
-        # ------------------
-        # Region: Two Limits Order
-        # ------------------
-        if incoming_order.type == "Limit" and matched_order.type == "Limit":
-            
-            if incoming_order < matched_order: #here we compare quantity
-                # ------------------
-                # Region: Incoming Order has bigger volume
-                # ------------------
-                
-                incoming_order_after_deal=incoming_order.updateQuantity(incoming_order.quantity)
-                matched_order_after_deal=matched_order.updateQuantity(incoming_order.quantity)
-                if incoming_order.direction == "Sell" and matched_order.direction == "Buy":
-                    self.uploadTransactions(buy_order=matched_order,
-                                            sell_order=incoming_order)
-                else:
-                    self.uploadTransactions(buy_order=incoming_order,
-                                            sell_order=matched_order)
-                if incoming_order_after_deal.quantity==0:  
-                    
-                    self.flowOrderHandle(order=incoming_order_after_deal)
-                    self.flowOrderHandle(order=matched_order_after_deal)
-                    
-                    self.uploadToOrderStatus(order=matched_order_after_deal)
-                    self.removeOrder(existing_order=incoming_order,id_for_remove=incoming_order.id)
-                    # we need to check order status and in case when quantity after matching is equal zero.
-                    # There is no need to display this but must be removed. 
-                    
-
-                else:
-                    self.flowOrderHandle(order=incoming_order_after_deal)
-                    self.flowOrderHandle(order=matched_order_after_deal)
-                
-
-             
-                # ------------------
-                # End Region: Incoming Order has bigger volume
-                # ------------------
-            elif incoming_order > matched_order:
-            # ------------------
-            # Region: Existing Order has bigger volume
-            # ------------------
-
-                # we compare with respect to quantity so we subtract quantity from smaller
-    
-                
-                incoming_order_after_deal=incoming_order.updateQuantity(matched_order.quantity)
-                matched_order_after_deal=matched_order.updateQuantity(matched_order.quantity)
-                if incoming_order.direction == "Sell" and matched_order.direction == "Buy":
-                    self.uploadTransactions(buy_order=matched_order,
-                                            sell_order=incoming_order)
-                else:
-                    self.uploadTransactions(buy_order=incoming_order,
-                                            sell_order=matched_order)
-                
-                if matched_order_after_deal.quantity==0:  
-                    #update heap for both and in addition remove from status book existing order. There is no volume
-                    
-                    self.flowOrderHandle(order=matched_order_after_deal)
-                    self.flowOrderHandle(order=incoming_order_after_deal)
-                    self.uploadToOrderStatus(order=incoming_order_after_deal)
-                    self.removeOrder(existing_order=matched_order,id_for_remove=matched_order.id)
-                    
-                    
-
-                else:
-
-                    self.flowOrderHandle(order=incoming_order_after_deal)
-                    self.flowOrderHandle(order=matched_order_after_deal)
-            # ------------------
-            # End Region: Existing Order has bigger volume
-            # ------------------        
-                    
-            else:
-            # ------------------
-            # Region: Order volumes are equal
-            # ------------------
-                incoming_order_after_deal=incoming_order.updateQuantity(incoming_order.quantity)
-                matched_order_after_deal=matched_order.updateQuantity(incoming_order.quantity)
-                if incoming_order.direction == "Sell" and matched_order.direction == "Buy":
-                    self.uploadTransactions(buy_order=matched_order,
-                                            sell_order=incoming_order)
-                else:
-                    self.uploadTransactions(buy_order=incoming_order,
-                                            sell_order=matched_order)
-                self.flowOrderHandle(order=matched_order_after_deal)
-                self.flowOrderHandle(order=incoming_order_after_deal)    
-                self.uploadToOrderStatus(order=incoming_order_after_deal)
-                self.uploadToOrderStatus(order=matched_order_after_deal)
-                self.removeOrder(existing_order=matched_order,id_for_remove=matched_order.id)
-                self.removeOrder(existing_order=incoming_order,id_for_remove=incoming_order.id)
-            # ------------------
-            # Region: Order volumes are equal
-            # ------------------          
-        # ------------------
-        # End Region: Two Limits Order
-        # ------------------
-
+        if incoming_order.direction == "Buy":
+            buy_order, sell_order = incoming_order, matched_order
+        else:
+            buy_order, sell_order = matched_order, incoming_order
         # ------------------
         # Region: Iceberg Order
         # ------------------
-
-        elif matched_order.type == "Iceberg" and incoming_order.type == "Limit":
-        
-            if incoming_order < matched_order:
-                #do until smaller order quantity ois positive
-                while incoming_order.quantity > 0:
-                    
-                        if incoming_order.direction == "Sell" and matched_order.direction == "Buy":
-                            self.uploadTransactions(buy_order=matched_order,sell_order=incoming_order)
-                        else:
-                            self.uploadTransactions(buy_order=incoming_order,sell_order=matched_order) 
-                        if incoming_order.quantity>=incoming_order.peak:
-                            incoming_order=incoming_order.updateQuantity(incoming_order.peak)
-                            matched_order=matched_order.updateQuantity(incoming_order.peak)
-                        else:
-                            incoming_order=incoming_order.updateQuantity(incoming_order.quantity)
-                            matched_order=matched_order.updateQuantity(incoming_order.quantity)
-                self.flowOrderHandle(order=incoming_order_after_deal)
-                self.flowOrderHandle(order=matched_order_after_deal)
-                self.uploadToOrderStatus(order=matched_order_after_deal)
-                self.removeOrder(existing_order=incoming_order,id_for_remove=incoming_order.id)             
-            elif incoming_order > matched_order:
-                #do until smaller order quantity ois positive
-                while matched_order.quantity > 0:
-                    
-                    if incoming_order.direction == "Sell" and matched_order.direction == "Buy":
-                        self.uploadTransactions(buy_order=matched_order,sell_order=incoming_order)
-                    else:
-                        self.uploadTransactions(buy_order=incoming_order,sell_order=matched_order)
-                    if matched_order.quantity>=matched_order.peak:
-                        incoming_order=incoming_order.updateQuantity(matched_order.peak)
-                        matched_order=matched_order.updateQuantity(matched_order.peak)
-                    else:
-                        incoming_order=incoming_order.updateQuantity(matched_order.quantity)
-                        matched_order=matched_order.updateQuantity(matched_order.quantity)
-                self.flowOrderHandle(order=matched_order)
-                self.flowOrderHandle(order=incoming_order)
-                self.uploadToOrderStatus(order=incoming_order)
-                self.removeOrder(existing_order=matched_order,id_for_remove=matched_order.id)
-        elif matched_order.type == "Limit" and incoming_order.type == "Iceberg":
-            if incoming_order < matched_order:
-                #do until smaller order quantity ois positive
-                while incoming_order.quantity > 0:
-                    
-                        if incoming_order.direction == "Sell" and matched_order.direction == "Buy":
-                            self.uploadTransactions(buy_order=matched_order,sell_order=incoming_order)
-                        else:
-                            self.uploadTransactions(buy_order=incoming_order,sell_order=matched_order) 
-                        if incoming_order.direction == "Sell" and matched_order.direction == "Buy":
-                            self.uploadTransactions(buy_order=matched_order,sell_order=incoming_order)
-                        else:
-                            self.uploadTransactions(buy_order=incoming_order,sell_order=matched_order)
-                        if incoming_order.quantity>=incoming_order.peak:
-                            incoming_order=incoming_order.updateQuantity(incoming_order.peak)
-                            matched_order=matched_order.updateQuantity(incoming_order.peak)
-                        else:
-                            incoming_order=incoming_order.updateQuantity(incoming_order.quantity)
-                            matched_order=matched_order.updateQuantity(incoming_order.quantity)
-                self.flowOrderHandle(order=incoming_order_after_deal)
-                self.flowOrderHandle(order=matched_order_after_deal)
-                self.uploadToOrderStatus(order=matched_order_after_deal)
-                self.removeOrder(existing_order=incoming_order,id_for_remove=incoming_order.id)             
-            elif incoming_order > matched_order:
-                #do until smaller order quantity ois positive
-                while matched_order.quantity > 0:
-                    
-                        if incoming_order.direction == "Sell" and matched_order.direction == "Buy":
-                            self.uploadTransactions(buy_order=matched_order,sell_order=incoming_order)
-                        else:
-                            self.uploadTransactions(buy_order=incoming_order,sell_order=matched_order)
-                        if incoming_order.direction == "Sell" and matched_order.direction == "Buy":
-                            self.uploadTransactions(buy_order=matched_order,sell_order=incoming_order)
-                        else:
-                            self.uploadTransactions(buy_order=incoming_order,sell_order=matched_order)
-                        if incoming_order.quantity>=incoming_order.peak:
-                            incoming_order=incoming_order.updateQuantity(incoming_order.peak)
-                            matched_order=matched_order.updateQuantity(incoming_order.peak)
-                        else:
-                            incoming_order=incoming_order.updateQuantity(incoming_order.quantity)
-                            matched_order=matched_order.updateQuantity(incoming_order.quantity)
-                self.flowOrderHandle(order=matched_order)
-                self.flowOrderHandle(order=incoming_order)
-                self.uploadToOrderStatus(order=incoming_order)
-                self.removeOrder(existing_order=matched_order,id_for_remove=matched_order.id)
-        elif matched_order.type == "Iceberg" and incoming_order.type == "Iceberg":
-            if incoming_order < matched_order:
-                #do until smaller order quantity ois positive
-                while incoming_order.quantity > 0:
-                    
-                        if incoming_order.direction == "Sell" and matched_order.direction == "Buy":
-                            self.uploadTransactions(buy_order=matched_order,sell_order=incoming_order)
-                        else:
-                            self.uploadTransactions(buy_order=incoming_order,sell_order=matched_order) 
-                        if incoming_order.quantity>=incoming_order.peak:
-                            incoming_order=incoming_order.updateQuantity(incoming_order.peak)
-                            matched_order=matched_order.updateQuantity(incoming_order.peak)
-                        
-                self.flowOrderHandle(order=incoming_order_after_deal)
-                self.flowOrderHandle(order=matched_order_after_deal)
-                self.uploadToOrderStatus(order=matched_order_after_deal)
-                self.removeOrder(existing_order=incoming_order,id_for_remove=incoming_order.id)             
-            elif incoming_order > matched_order:
-                #do until smaller order quantity ois positive
-                while matched_order.quantity > 0:
-                    
-                        if incoming_order.direction == "Sell" and matched_order.direction == "Buy":
-                            self.uploadTransactions(buy_order=matched_order,sell_order=incoming_order)
-                        else:
-                            self.uploadTransactions(buy_order=incoming_order,sell_order=matched_order)
-                        if matched_order.quantity>=matched_order.peak:
-                            incoming_order=incoming_order.updateQuantity(matched_order.peak)
-                            matched_order=matched_order.updateQuantity(matched_order.peak)                            
-
-
-
-             
-                self.flowOrderHandle(order=matched_order)
-                self.flowOrderHandle(order=incoming_order)
-                self.uploadToOrderStatus(order=incoming_order)
-                self.removeOrder(existing_order=matched_order,id_for_remove=matched_order.id)
-            else:
-                incoming_order=incoming_order.updateQuantity(incoming_order.peak)
-                matched_order=matched_order.updateQuantity(incoming_order.peak)
-                if incoming_order.direction == "Sell" and matched_order.direction == "Buy":
-                    self.uploadTransactions(buy_order=matched_order,
-                                            sell_order=incoming_order)
-                else:
-                    self.uploadTransactions(buy_order=incoming_order,
-                                            sell_order=matched_order)
-                self.flowOrderHandle(order=matched_order)
-                self.flowOrderHandle(order=incoming_order)    
-                self.uploadToOrderStatus(order=incoming_order)
-                self.uploadToOrderStatus(order=matched_order)
-                self.removeOrder(existing_order=matched_order,id_for_remove=matched_order.id)
-                self.removeOrder(existing_order=incoming_order,id_for_remove=incoming_order.id)            
-
-            
-
-        #remove must be done via id, because trade's attributes might be modified 
-        #before prompt this check if another match is possible, so remove prompter
+        # (size, number) of deals the resting order trades in
+        if matched_order.type == "Iceberg":
+            shown = quantity if visible_quantity is None else min(visible_quantity, quantity)
+            peaks, rest = divmod(quantity - shown, matched_order.peak)
+            deals = ((shown, 1), (matched_order.peak, peaks), (rest, 1))
+        else:
+            deals = ((quantity, 1),)
+        cap = incoming_order.peak if incoming_order.type == "Iceberg" else None
         # ------------------
         #  End Region: Iceberg Order
         # ------------------
-                      
+        price = matched_order.price
+        for deal, number in deals:
+            if not deal:
+                continue
+            parts = (deal,) if cap is None or deal <= cap else (cap,) * (deal // cap) + ((deal % cap,) if deal % cap else ())
+            for _ in range(number):
+                for part in parts:
+                    self.uploadTransactions(buy_order=buy_order, sell_order=sell_order, price=price, quantity=part)
+
+        if matched_order.quantity > 0:
+            self.updateOrderStatus(order=matched_order)
+        else:
+            self.removeOrder(existing_order=matched_order, id_for_remove=matched_order.id)
 
     def uploadTransactions(self, buy_order: OrderHandler,
-                           sell_order: OrderHandler):
+                           sell_order: OrderHandler,
+                           price: int,
+                           quantity: int):
         """uploadTransactions
         Description
         -----------
-        This method prints transactions that has place in format defined in the spec. 
+        This method records transaction that has place in format defined in the spec. 
 
         Parameters
         ----------
         buy_order : OrderHandler
-            Matching order from ask side.
+            Matching order from buy side.
         sell_order : OrderHandler
-            Matching order from bid side.
+            Matching order from sell side.
+        price : int
+            Price of the deal.
+        quantity : int
+            Traded volume.
         """
-
-        if buy_order < sell_order:
-            price = buy_order.price
-            if buy_order.type == "Limit":
-                self._transactions_container.append({
-                    "buyOrderId":
-                    buy_order.id,
-                    "sellOrderId":
-                    sell_order.id,
-                    "price":
-                    price,
-                    "quantity":
-                    buy_order.quantity
-                })
-            elif buy_order.type == "Iceberg":
-                if buy_order.quantity>=buy_order.peak:
-                    self._transactions_container.append({
-                        "buyOrderId": buy_order.id,
-                        "sellOrderId": sell_order.id,
-                        "price": price,
-                        "quantity": buy_order.peak
-                    })
-                else:
-                    self._transactions_container.append({
-                        "buyOrderId": buy_order.id,
-                        "sellOrderId": sell_order.id,
-                        "price": price,
-                        "quantity": buy_order.quantity
-                    })
-
-
-        elif buy_order > sell_order:
-            price = sell_order.price
-            if sell_order.type == "Limit":
-                self._transactions_container.append({
-                    "buyOrderId":
-                    buy_order.id,
-                    "sellOrderId":
-                    sell_order.id,
-                    "price":
-                    price,
-                    "quantity":
-                    sell_order.quantity
-                })
-            elif sell_order.type == "Iceberg":
-                if sell_order.quantity>=sell_order.peak:
-                    self._transactions_container.append({
-                        "buyOrderId": buy_order.id,
-                        "sellOrderId": sell_order.id,
-                        "price": price,
-                        "quantity": sell_order.peak
-                    })
-                else:
-                      self._transactions_container.append({
-                        "buyOrderId": buy_order.id,
-                        "sellOrderId": sell_order.id,
-                        "price": price,
-                        "quantity": sell_order.quantity
-                    })
+        trade = Trade(buy_order.id, sell_order.id, price, quantity)
+        self._event_trades.append(trade)
+        if self._trade_sink is not None:
+            self._trade_sink.emit(trade)
         else:
-            price = sell_order.price
-            if sell_order.type == "Limit":
-                self._transactions_container.append({
-                    "buyOrderId":
-                    buy_order.id,
-                    "sellOrderId":
-                    sell_order.id,
-                    "price":
-                    price,
-                    "quantity":
-                    sell_order.quantity
-                })
-            elif sell_order.type == "Iceberg":
-                if sell_order.quantity>=sell_order.peak:
-                    self._transactions_container.append({
-                        "buyOrderId": buy_order.id,
-                        "sellOrderId": sell_order.id,
-                        "price": price,
-                        "quantity": sell_order.peak
-                    })
-                else:
-                    self._transactions_container.append({
-                        "buyOrderId": buy_order.id,
-                        "sellOrderId": sell_order.id,
-                        "price": price,
-                        "quantity": sell_order.quantity
-                    })  
-                
+            self._transactions_container.append(trade)
+        if self._journal is not None:
+            self._journal.tradeMade(trade)
+        if self._market_view is not None:
+            self._market_view.tradeMade(trade)
+        self._output.tradeMade(trade)
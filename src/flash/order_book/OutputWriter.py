@@ -0,0 +1,175 @@
+from typing import TypeVar, Iterable, Tuple, Dict, List
+import sys
+
+HM = TypeVar("HM", bound=Dict)
+
+
+class OutputWriter:
+
+    def __init__(self, stream=None, buffer_size: int = 1024) -> None:
+        """__init__
+        Description
+        -----------
+        Base class for writers of order book events. Order book reports every change of the
+        published book, every trade and the end of every processed event. Lines are kept in a
+        buffer and written in bulk.
+
+        Parameters
+        ----------
+        stream : file object
+            Destination of the output. Standard output if not given.
+        buffer_size : int
+            Number of lines kept in memory before they are written to the stream.
+        """
+        self._stream = stream
+        self._buffer_size = buffer_size
+        self._buffer = []
+
+    # ------------------
+    # Region: Buffering
+    # ------------------
+    def write(self, record) -> None:
+        """write
+        Description
+        -----------
+        Put single record in the buffer, flush the buffer when it is full.
+
+        Parameters
+        ----------
+        record : HM
+            Record to be written in one line.
+        """
+        self._buffer.append(f"{record}\n")
+        if len(self._buffer) >= self._buffer_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """flush
+        Description
+        -----------
+        Write all buffered lines to the stream.
+        """
+        if self._buffer:
+            stream = self._stream if self._stream is not None else sys.stdout
+            stream.writelines(self._buffer)
+            self._buffer.clear()
+
+    # ------------------
+    # End Region: Buffering
+    # ------------------
+
+    # ------------------
+    # Region: Book events
+    # ------------------
+    def orderAdded(self, order) -> None:
+        pass
+
+    def orderModified(self, order) -> None:
+        pass
+
+    def orderRemoved(self, order) -> None:
+        pass
+
+    def tradeMade(self, trade) -> None:
+        pass
+
+    def eventProcessed(self, order_book) -> None:
+        pass
+
+    def close(self, order_book, transactions: List) -> None:
+        """close
+        Description
+        -----------
+        End of the stream, remaining buffer is written.
+
+        Parameters
+        ----------
+        order_book : OrderBook
+            Book at the end of the stream, status is read with 'ordersStatus'.
+        transactions : List
+            All transactions of the session.
+        """
+        self.flush()
+
+    # ------------------
+    # End Region: Book events
+    # ------------------
+
+
+class SnapshotWriter(OutputWriter):
+    """SnapshotWriter
+    Description
+    -----------
+    Legacy output. Full status of the book after every event, all transactions at the end of the stream.
+    """
+
+    def eventProcessed(self, order_book) -> None:
+        self.write(order_book.ordersStatus())
+
+    def close(self, order_book, transactions: List) -> None:
+        for tran in transactions:
+            self.write(tran._asdict())
+        self.flush()
+
+
+class DeltaWriter(OutputWriter):
+    """DeltaWriter
+    Description
+    -----------
+    Incremental output. One line for every order added, modified or removed from the book
+    and for every trade, written as it happens. Cost of the output does not depend on size of the book.
+    """
+
+    def orderAdded(self, order) -> None:
+        self.write({"event": "add", "direction": order.direction, "id": order.id,
+                    "price": order.price, "quantity": order.visible_quantity})
+
+    def orderModified(self, order) -> None:
+        self.write({"event": "modify", "direction": order.direction, "id": order.id,
+                    "price": order.price, "quantity": order.visible_quantity})
+
+    def orderRemoved(self, order) -> None:
+        self.write({"event": "remove", "direction": order.direction, "id": order.id})
+
+    def tradeMade(self, trade) -> None:
+        self.write({"event": "trade", **trade._asdict()})
+
+
+class PeriodicSnapshotWriter(OutputWriter):
+
+    def __init__(self, stream=None, buffer_size: int = 1024, every: int = 1000) -> None:
+        """__init__
+        Description
+        -----------
+        Full status of the book every 'every' events and at the end of the stream,
+        followed by all transactions.
+
+        Parameters
+        ----------
+        stream : file object
+            Destination of the output. Standard output if not given.
+        buffer_size : int
+            Number of lines kept in memory before they are written to the stream.
+        every : int
+            Number of events between two snapshots.
+        """
+        super().__init__(stream=stream, buffer_size=buffer_size)
+        if every <= 0:
+            raise ValueError("Number of events between snapshots must be positive.")
+        self._every = every
+        self._events = 0
+
+    def eventProcessed(self, order_book) -> None:
+        self._events += 1
+        if self._events % self._every == 0:
+            self.write(order_book.ordersStatus())
+
+    def close(self, order_book, transactions: List) -> None:
+        if self._events % self._every != 0:
+            self.write(order_book.ordersStatus())
+        for tran in transactions:
+            self.write(tran._asdict())
+        self.flush()
+
+
+OUTPUT_MODES = {"snapshot": SnapshotWriter, "delta": DeltaWriter, "periodic": PeriodicSnapshotWriter}
@@ -0,0 +1,232 @@
+from flash.order_book.MarketView import MarketView
+from flash.order_book.OrderProcessing import Trade
+from multiprocessing import shared_memory, resource_tracker
+from typing import TypeVar, Iterable, Tuple, Dict, List
+from itertools import chain
+import struct
+import sys
+import time
+
+HM = TypeVar("HM", bound=Dict)
+
+SHARED_BOOK_MAGIC = b"OBSHM001"
+# magic, sequence, levels, trades capacity, bid levels, ask levels, total trades, publications; little endian
+# sequence is the seqlock: odd while the block is being written, incremented again when it is consistent
+HEADER = struct.Struct("<8s7q")
+SEQUENCE = struct.Struct("<q")
+SEQUENCE_OFFSET = 8
+# bid levels, ask levels, total trades, publications; the part of the header changed by every publication
+COUNTERS = struct.Struct("<4q")
+COUNTERS_OFFSET = 32
+# then 'levels' (price, volume) pairs of bids from the best one, the same for asks,
+# then ring of 'trades capacity' trades (buyOrderId, sellOrderId, price, quantity), trade number n in slot n % capacity
+TRADE_RECORD = struct.Struct("<4q")
+
+
+def levelsStruct(levels: int) -> struct.Struct:
+    return struct.Struct(f"<{4 * levels}q")
+
+
+def blockSize(levels: int, trades_capacity: int) -> int:
+    return HEADER.size + levelsStruct(levels).size + trades_capacity * TRADE_RECORD.size
+
+
+class SharedBookPublisher(MarketView):
+
+    def __init__(self, name: str = None, levels: int = 10, trades_capacity: int = 256) -> None:
+        """__init__
+        Description
+        -----------
+        Market view published in shared memory block with fixed binary layout, see 'HEADER', so local
+        processes read the book with 'SharedBookReader' without any serialisation. Block is written at the end
+        of an event only if top 'levels' levels have changed or trades were made, between two increments
+        of the seqlock 'sequence'. Passed to the book with 'OrderBook(..., market_view=publisher)'.
+
+        Parameters
+        ----------
+        name : str
+            Name of the block, random if not given, see 'name' attribute.
+        levels : int
+            Number of published levels of every side.
+        trades_capacity : int
+            Number of last trades kept in the block.
+        """
+        super().__init__()
+        if levels <= 0 or trades_capacity <= 0:
+            raise ValueError("Number of levels and trades capacity must be positive.")
+        self.levels = levels
+        self.trades_capacity = trades_capacity
+        self._levels_struct = levelsStruct(levels)
+        self._trades_offset = HEADER.size + self._levels_struct.size
+        self._shm = shared_memory.SharedMemory(name=name, create=True, size=blockSize(levels, trades_capacity))
+        self.name = self._shm.name
+        self._buffer = self._shm.buf
+        self._sequence = 0
+        self._trades_total = 0
+        self._publications = 0
+        self._bid_levels = self._ask_levels = 0
+        self._pending_depth = None
+        self._pending_trades = []
+        self._padding = [0] * (2 * levels)
+        HEADER.pack_into(self._buffer, 0, SHARED_BOOK_MAGIC, 0, levels, trades_capacity, 0, 0, 0, 0)
+        self.subscribe(self.depthChanged, levels)
+
+    def depthChanged(self, depth: HM) -> None:
+        self._pending_depth = depth
+
+    def tradeMade(self, trade) -> None:
+        super().tradeMade(trade)
+        self._pending_trades.append(trade)
+
+    def eventProcessed(self) -> None:
+        """eventProcessed
+        Description
+        -----------
+        End of the event, changed depth and new trades are written to the block at once.
+        """
+        super().eventProcessed()
+        if self._pending_depth is not None or self._pending_trades:
+            self.publish()
+
+    def publish(self) -> None:
+        """publish
+        Description
+        -----------
+        Write pending depth and trades inside the seqlock: sequence is made odd, data and header are stored,
+        sequence is made even again. Readers retry while the sequence is odd or has changed during their read.
+        """
+        buffer = self._buffer
+        self._sequence += 1
+        SEQUENCE.pack_into(buffer, SEQUENCE_OFFSET, self._sequence)
+        depth = self._pending_depth
+        if depth is not None:
+            bids, asks = depth["bids"], depth["asks"]
+            padding = self._padding
+            self._levels_struct.pack_into(buffer, HEADER.size, *chain.from_iterable(bids),
+                                          *padding[:2 * (self.levels - len(bids))], *chain.from_iterable(asks),
+                                          *padding[:2 * (self.levels - len(asks))])
+            self._bid_levels = len(bids)
+            self._ask_levels = len(asks)
+            self._pending_depth = None
+        if self._pending_trades:
+            offset, capacity, size = self._trades_offset, self.trades_capacity, TRADE_RECORD.size
+            for trade in self._pending_trades:
+                TRADE_RECORD.pack_into(buffer, offset + self._trades_total % capacity * size, *trade)
+                self._trades_total += 1
+            self._pending_trades.clear()
+        self._publications += 1
+        COUNTERS.pack_into(buffer, COUNTERS_OFFSET, self._bid_levels, self._ask_levels, self._trades_total,
+                           self._publications)
+        self._sequence += 1
+        SEQUENCE.pack_into(buffer, SEQUENCE_OFFSET, self._sequence)
+
+    def close(self, unlink: bool = True) -> None:
+        """close
+        Description
+        -----------
+        Detach from the block and, if 'unlink', remove it. Readers attached to it keep their mapping.
+        """
+        if self._shm is not None:
+            self._buffer.release()
+            self._shm.close()
+            if unlink:
+                self._shm.unlink()
+            self._shm = None
+
+
+class SharedBookReader:
+
+    def __init__(self, name: str) -> None:
+        """__init__
+        Description
+        -----------
+        Attach to the block of 'SharedBookPublisher' of another process. Reader never writes to the block
+        and does not own it, the block is removed by the publisher.
+
+        Parameters
+        ----------
+        name : str
+            Name of the block, 'SharedBookPublisher.name'.
+        """
+        if sys.version_info >= (3, 13):
+            self._shm = shared_memory.SharedMemory(name=name, track=False)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+            # attached block must not be removed by the resource tracker when this process ends
+            resource_tracker.unregister(self._shm._name, "shared_memory")
+        self._buffer = self._shm.buf
+        magic, _, self.levels, self.trades_capacity, *_ = HEADER.unpack_from(self._buffer, 0)
+        if magic != SHARED_BOOK_MAGIC:
+            raise ValueError(f"{name} is not a shared book.")
+        self._levels_struct = levelsStruct(self.levels)
+        self._trades_offset = HEADER.size + self._levels_struct.size
+
+    def sequence(self) -> int:
+        """sequence
+        Description
+        -----------
+        Current value of the seqlock, changes with every publication. Cheap check if the book has changed.
+        """
+        return SEQUENCE.unpack_from(self._buffer, SEQUENCE_OFFSET)[0]
+
+    def read(self, trades: int = None, retries: int = 10000) -> HM:
+        """read
+        Description
+        -----------
+        Consistent snapshot of the block. Data is read between two reads of the sequence and the read is
+        repeated if the publisher was writing in between.
+
+        Parameters
+        ----------
+        trades : int
+            Number of last trades to read, all kept trades by default.
+        retries : int
+            Number of attempts before giving up.
+
+        Returns
+        -------
+        HM
+            {"sequence": ..., "bids": [(price, volume), ...], "asks": [...], "trades": [Trade, ...], "trades_total": ...}
+            Levels from the best one, trades from the oldest one.
+
+        Raises
+        ------
+        ValueError
+            If no consistent snapshot was read in 'retries' attempts.
+        """
+        buffer = self._buffer
+        for _ in range(retries):
+            sequence = SEQUENCE.unpack_from(buffer, SEQUENCE_OFFSET)[0]
+            if sequence & 1:
+                # publisher may have been preempted in the middle of writing, let it finish
+                time.sleep(0)
+                continue
+            _, _, _, _, bid_levels, ask_levels, trades_total, _ = HEADER.unpack_from(buffer, 0)
+            values = self._levels_struct.unpack_from(buffer, HEADER.size)
+            kept = min(trades_total, self.trades_capacity if trades is None else min(trades, self.trades_capacity))
+            records = [TRADE_RECORD.unpack_from(buffer, self._trades_offset + number % self.trades_capacity
+                                                * TRADE_RECORD.size)
+                       for number in range(trades_total - kept, trades_total)]
+            if SEQUENCE.unpack_from(buffer, SEQUENCE_OFFSET)[0] != sequence:
+                time.sleep(0)
+                continue
+            asks = 2 * self.levels
+            return {"sequence": sequence,
+                    "bids": [(values[i], values[i + 1]) for i in range(0, 2 * bid_levels, 2)],
+                    "asks": [(values[asks + i], values[asks + i + 1]) for i in range(0, 2 * ask_levels, 2)],
+                    "trades": [Trade(*record) for record in records], "trades_total": trades_total}
+        raise ValueError("Shared book is written too often to be read consistently.")
+
+    def close(self) -> None:
+        if self._shm is not None:
+            self._buffer.release()
+            self._shm.close()
+            self._shm = None
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        sys.exit("usage: python -m flash.order_book.SharedBook NAME")
+    reader = SharedBookReader(sys.argv[1])
+    print(reader.read())
+    reader.close()
@@ -0,0 +1,228 @@
+from flash.order_book.OrderProcessing import OrderBook, Trade
+from flash.order_book.OrderDecoder import OrderDecoder
+from flash.order_book.OutputWriter import OutputWriter
+from flash.order_book.TradeSink import NullTradeSink
+from typing import TypeVar, Iterable, Iterator, Tuple, Dict, List
+import heapq
+import math
+import multiprocessing
+import os
+import queue
+import re
+import zlib
+
+HM = TypeVar("HM", bound=Dict)
+
+SYMBOL_PATTERN = re.compile(r'"symbol"\s*:\s*"([^"\\]*)"')
+# messages of workers: trades of a matched batch, final status of the books, error
+TRADES, BOOKS, ERROR = 0, 1, 2
+# seconds between checks that workers are alive while the router waits for them
+POLL_INTERVAL = 1.0
+
+
+class SymbolRouter:
+
+    def __init__(self, workers: int = None, book_type: str = "price_level", batch_size: int = 4096,
+                 queue_size: int = 8, instruments: Dict[str, HM] = None) -> None:
+        """__init__
+        Description
+        -----------
+        Run one order book per symbol. Stream is partitioned by symbol and every partition is
+        matched by its own worker process, so all orders of a symbol go through one worker
+        in the order of the stream. Trades of all workers are merged by position of the
+        incoming order in the stream, hence the result does not depend on scheduling.
+
+        Parameters
+        ----------
+        workers : int
+            Number of worker processes, number of cores by default.
+        book_type : str
+            Backend of every book, see 'BookSides.BOOK_SIDES'.
+        batch_size : int
+            Number of lines sent to a worker at once.
+        queue_size : int
+            Number of batches waiting for a worker. Reading of the stream stops when a worker is behind.
+        instruments : Dict[str, HM]
+            Backend of the book of particular symbols, 'book_type' and its options,
+            e.g. {"ABC": {"book_type": "tick_ladder", "min_price": 9000, "max_price": 11000, "tick": 5}}.
+            Other symbols use 'book_type'.
+        """
+        self.workers = workers or os.cpu_count() or 1
+        if self.workers <= 0 or batch_size <= 0 or queue_size <= 0:
+            raise ValueError("Number of workers, batch size and queue size must be positive.")
+        self.book_type = book_type
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.instruments = instruments or {}
+
+    @staticmethod
+    def symbolOf(line: str) -> str:
+        """symbolOf
+        Description
+        -----------
+        Symbol of raw order line, found without decoding the whole line. None if the order has no symbol.
+        """
+        match = SYMBOL_PATTERN.search(line)
+        return match.group(1) if match is not None else None
+
+    @staticmethod
+    def workerOf(symbol: str, workers: int) -> int:
+        """workerOf
+        Description
+        -----------
+        Worker of the symbol. crc32 is used instead of 'hash', which differs between processes.
+        """
+        return zlib.crc32((symbol or "").encode()) % workers
+
+    @staticmethod
+    def runWorker(worker: int, inbox, outbox, book_type: str, instruments: Dict[str, HM] = None) -> None:
+        """runWorker
+        Description
+        -----------
+        Body of the worker process. Batches of (sequence, line) are matched in books of their symbols
+        until None arrives. Trades of every batch, tagged with (sequence, index within event, symbol),
+        are sent back with the last sequence of the batch as soon as it is matched, so the worker keeps
+        no trades. Final status of every book is sent at the end. After an invalid order the rest of the
+        input is drained, so the router is never blocked, and the error is sent back instead. Whole body
+        is guarded, so the router always gets the final message of the worker.
+        """
+        try:
+            books = {}
+            error = None
+            decode = OrderDecoder.decodeOrder
+            while True:
+                batch = inbox.get()
+                if batch is None:
+                    break
+                if error is not None:
+                    continue
+                trades = []
+                try:
+                    for sequence, line in batch:
+                        order = decode(line)
+                        book = books.get(order.symbol)
+                        if book is None:
+                            book_options = dict((instruments or {}).get(order.symbol, {}))
+                            book = books[order.symbol] = OrderBook(book_type=book_options.pop("book_type", book_type),
+                                                                   book_options=book_options, output=OutputWriter(),
+                                                                   trade_sink=NullTradeSink(batch_size=4096))
+                        for index, trade in enumerate(book.submit(order)):
+                            trades.append((sequence, index, order.symbol, tuple(trade)))
+                except Exception as e:
+                    error = f"{type(e).__name__}: {e}"
+                    continue
+                outbox.put((TRADES, worker, batch[-1][0], trades))
+            if error is None:
+                outbox.put((BOOKS, worker, {symbol: book.snapshot() for symbol, book in books.items()}))
+                return
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+        outbox.put((ERROR, worker, error))
+
+    def run(self, lines: Iterable[str]) -> Tuple[Dict[str, HM], Iterator[Tuple[str, Trade]]]:
+        """run
+        Description
+        -----------
+        Route the stream to workers and wait for all of them. Trades are received while the stream is
+        routed and merged in the order of the stream as soon as no worker can send an earlier one.
+
+        Parameters
+        ----------
+        lines : Iterable[str]
+            Orders in the input format, one json per line, optionally with "symbol" in "order".
+
+        Returns
+        -------
+        Tuple[Dict[str, HM], Iterator[Tuple[str, Trade]]]
+            Final status of the book of every symbol and (symbol, trade) pairs in the order they happened in the stream.
+
+        Raises
+        ------
+        ValueError
+            If any worker failed on an invalid order or exited without its result.
+        """
+        context = multiprocessing.get_context()
+        inboxes = [context.Queue(self.queue_size) for _ in range(self.workers)]
+        outbox = context.Queue()
+        processes = [context.Process(target=SymbolRouter.runWorker,
+                                     args=(worker, inbox, outbox, self.book_type, self.instruments), daemon=True)
+                     for worker, inbox in enumerate(inboxes)]
+        # last sequence matched by every worker, a worker never sends trades of an earlier order later
+        matched = [-1] * self.workers
+        pending = []
+        merged = []
+        books = {}
+        errors = []
+        finished = set()
+
+        def receive(message) -> None:
+            kind, worker = message[0], message[1]
+            if kind == TRADES:
+                matched[worker] = message[2]
+                for trade in message[3]:
+                    heapq.heappush(pending, trade)
+            else:
+                finished.add(worker)
+                matched[worker] = math.inf
+                if kind == BOOKS:
+                    books.update(message[2])
+                else:
+                    errors.append(message[2])
+            low = min(matched)
+            while pending and pending[0][0] <= low:
+                merged.append(heapq.heappop(pending))
+
+        def drain() -> None:
+            while True:
+                try:
+                    receive(outbox.get_nowait())
+                except queue.Empty:
+                    return
+
+        def put(worker: int, item) -> None:
+            while True:
+                try:
+                    inboxes[worker].put(item, timeout=POLL_INTERVAL)
+                    break
+                except queue.Full:
+                    drain()
+                    if not processes[worker].is_alive():
+                        raise ValueError(f"Worker {worker} exited with code {processes[worker].exitcode}.") from None
+            drain()
+
+        for process in processes:
+            process.start()
+        try:
+            batches = [[] for _ in range(self.workers)]
+            symbol_of, worker_of, workers = self.symbolOf, self.workerOf, self.workers
+            for sequence, line in enumerate(lines):
+                if not line.strip():
+                    continue
+                worker = worker_of(symbol_of(line), workers)
+                batch = batches[worker]
+                batch.append((sequence, line))
+                if len(batch) >= self.batch_size:
+                    put(worker, batch)
+                    batches[worker] = []
+            for worker, batch in enumerate(batches):
+                if batch:
+                    put(worker, batch)
+                put(worker, None)
+            while len(finished) < self.workers:
+                # worker found dead before waiting has already written everything it ever will
+                dead = [worker for worker, process in enumerate(processes)
+                        if worker not in finished and process.exitcode is not None]
+                try:
+                    receive(outbox.get(timeout=POLL_INTERVAL))
+                except queue.Empty:
+                    if dead:
+                        raise ValueError(f"Worker {dead[0]} exited with code {processes[dead[0]].exitcode} "
+                                         f"without result.") from None
+        finally:
+            for process in processes:
+                process.join(timeout=1)
+                if process.is_alive():
+                    process.terminate()
+        if errors:
+            raise ValueError(f"Order stream rejected by worker: {errors[0]}")
+        return books, ((symbol, Trade(*trade)) for _, _, symbol, trade in merged)
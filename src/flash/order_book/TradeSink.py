@@ -0,0 +1,163 @@
+from flash.python_tool_kit.IOToolKit import IOToolKit
+from typing import TypeVar, Iterable, Iterator, Tuple, Dict, List
+import struct
+import sys
+
+HM = TypeVar("HM", bound=Dict)
+
+# buyOrderId, sellOrderId, price, quantity as little endian 64 bit integers
+TRADE_RECORD = struct.Struct("<qqqq")
+
+
+class TradeSink:
+
+    def __init__(self, stream=None, batch_size: int = 1, flush_stream: bool = True) -> None:
+        """__init__
+        Description
+        -----------
+        Base class for destinations of trades. Trades are emitted as they happen and written
+        in batches of 'batch_size', so downstream readers may tail the log during the session.
+
+        Parameters
+        ----------
+        stream : file object
+            Destination of the trades. Standard output if not given.
+        batch_size : int
+            Number of trades kept in memory before they are written. 1 writes every trade at once.
+        flush_stream : bool
+            If True then the stream itself is flushed after every batch.
+        """
+        if batch_size <= 0:
+            raise ValueError("Batch size must be positive.")
+        self._stream = stream
+        self._batch_size = batch_size
+        self._flush_stream = flush_stream
+        self._batch = []
+
+    def emit(self, trade) -> None:
+        """emit
+        Description
+        -----------
+        Accept single trade, write the batch when it is full.
+
+        Parameters
+        ----------
+        trade : Trade
+            Transaction made by the book.
+        """
+        self._batch.append(trade)
+        if len(self._batch) >= self._batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """flush
+        Description
+        -----------
+        Write all pending trades.
+        """
+        if self._batch:
+            stream = self._stream if self._stream is not None else sys.stdout
+            self.writeBatch(stream, self._batch)
+            self._batch.clear()
+            if self._flush_stream:
+                stream.flush()
+
+    def close(self) -> None:
+        """close
+        Description
+        -----------
+        End of the session, pending trades are written.
+        """
+        self.flush()
+
+    def writeBatch(self, stream, trades: List) -> None:
+        raise NotImplementedError
+
+
+class LineTradeSink(TradeSink):
+    """LineTradeSink
+    Description
+    -----------
+    One trade per line in the legacy format, e.g. {'buyOrderId': 2, 'sellOrderId': 4, 'price': 15, 'quantity': 20}.
+    """
+
+    def writeBatch(self, stream, trades: List) -> None:
+        stream.writelines([f"{trade._asdict()}\n" for trade in trades])
+
+
+class CsvTradeSink(TradeSink):
+    """CsvTradeSink
+    Description
+    -----------
+    One trade per line as comma separated values 'buyOrderId,sellOrderId,price,quantity', header is written first.
+    """
+
+    def __init__(self, stream=None, batch_size: int = 1, flush_stream: bool = True) -> None:
+        super().__init__(stream=stream, batch_size=batch_size, flush_stream=flush_stream)
+        self._header_written = False
+
+    def writeBatch(self, stream, trades: List) -> None:
+        if not self._header_written:
+            stream.write("buyOrderId,sellOrderId,price,quantity\n")
+            self._header_written = True
+        stream.writelines([f"{t[0]},{t[1]},{t[2]},{t[3]}\n" for t in trades])
+
+
+class BinaryTradeSink(TradeSink):
+    """BinaryTradeSink
+    Description
+    -----------
+    Fixed width binary records, see 'TRADE_RECORD'. Stream must be opened in binary mode.
+    """
+
+    def writeBatch(self, stream, trades: List) -> None:
+        stream.write(b"".join([TRADE_RECORD.pack(*trade) for trade in trades]))
+
+    @staticmethod
+    def readTradeLog(file_name) -> Iterator[Tuple[int, int, int, int]]:
+        """readTradeLog
+        Description
+        -----------
+        Read binary trade log written by 'BinaryTradeSink'.
+
+        Parameters
+        ----------
+        file_name : str
+            Path to the trade log, plain or compressed, see 'IOToolKit.openFile'.
+
+        Yields
+        ------
+        Tuple[int, int, int, int]
+            buyOrderId, sellOrderId, price, quantity
+        """
+        with IOToolKit.openFile(file_name, "rb") as f:
+            rest = b""
+            while True:
+                chunk = f.read(TRADE_RECORD.size * 4096)
+                if not chunk:
+                    break
+                chunk = rest + chunk
+                end = len(chunk) - len(chunk) % TRADE_RECORD.size
+                yield from TRADE_RECORD.iter_unpack(chunk[:end])
+                rest = chunk[end:]
+
+
+class NullTradeSink(TradeSink):
+    """NullTradeSink
+    Description
+    -----------
+    Trades are dropped. Book with this sink keeps no transactions, trades are only returned by 'OrderBook.submit'.
+    Nothing is written, so no stream is ever flushed.
+    """
+
+    def __init__(self, stream=None, batch_size: int = 1, flush_stream: bool = False) -> None:
+        super().__init__(stream=stream, batch_size=batch_size, flush_stream=flush_stream)
+
+    def flush(self) -> None:
+        self._batch.clear()
+
+    def writeBatch(self, stream, trades: List) -> None:
+        pass
+
+
+TRADE_FORMATS = {"line": LineTradeSink, "csv": CsvTradeSink, "binary": BinaryTradeSink}
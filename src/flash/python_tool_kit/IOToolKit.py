@@ -1,11 +1,85 @@
 import json
-from typing import TypeVar, Iterable, Tuple, Dict, List
+from typing import TypeVar, Iterable, Iterator, Tuple, Dict, List
 HM = TypeVar("HM", bound=Dict)
+import bz2
+import glob
+import gzip
+import io
+import lzma
 import os
 
+# extension -> module of the stdlib codec, files are (de)compressed while they are streamed
+COMPRESSIONS = {".gz": gzip, ".xz": lzma, ".bz2": bz2}
+# size of read-ahead and write buffers, bounds memory used per open file
+BUFFER_SIZE = 1 << 16
+
 
 class IOToolKit:
-    
+
+    # ------------------
+    # Region: Files
+    # ------------------
+    @staticmethod
+    def compressionOf(file_name) -> str:
+        """compressionOf
+        Description
+        -----------
+        Compression extension of the file, one of 'COMPRESSIONS', None for a plain file.
+        """
+        extension = os.path.splitext(str(file_name))[1]
+        return extension if extension in COMPRESSIONS else None
+
+    @staticmethod
+    def stripCompression(file_name) -> str:
+        extension = IOToolKit.compressionOf(file_name)
+        return file_name[:-len(extension)] if extension is not None else file_name
+
+    @staticmethod
+    def openFile(file_name, mode: str = "r", buffer_size: int = BUFFER_SIZE):
+        """openFile
+        Description
+        -----------
+        Open plain or compressed file, codec is chosen by extension, see 'COMPRESSIONS'. Compressed data is
+        decoded while it is read and encoded while it is written, decompressed file is never staged on disk.
+        Reads go through a read-ahead buffer of 'buffer_size' bytes and writes are flushed to the codec in
+        blocks of the same size, so memory does not depend on the size of the file.
+
+        Parameters
+        ----------
+        file_name : str
+            Path to the file, e.g. 'test1.in', 'test1.in.gz', 'test1.out.xz'.
+        mode : str
+            'r', 'w', 'a' with optional 'b' as in 'open'. Text is always utf-8.
+        buffer_size : int
+            Size of the read-ahead or write buffer in bytes.
+
+        Returns
+        -------
+        file object
+            Text or binary file, closing it closes the codec and the file.
+        """
+        if mode.replace("b", "") not in ("r", "w", "a"):
+            raise ValueError("File mode might be only 'r', 'w' or 'a' with optional 'b'.")
+        extension = IOToolKit.compressionOf(file_name)
+        binary = "b" in mode
+        if extension is None:
+            return open(file_name, mode, buffering=buffer_size, encoding=None if binary else "utf-8")
+        raw_mode = mode.replace("b", "") + "b"
+        if extension == ".gz":
+            # level 6 is much faster than the default 9 and compresses order streams almost as well
+            stream = gzip.GzipFile(file_name, raw_mode, compresslevel=6)
+        else:
+            stream = COMPRESSIONS[extension].open(file_name, raw_mode)
+        if raw_mode == "rb":
+            stream = io.BufferedReader(stream, buffer_size=buffer_size)
+        else:
+            stream = io.BufferedWriter(stream, buffer_size=buffer_size)
+        return stream if binary else io.TextIOWrapper(stream, encoding="utf-8")
+
+    # ------------------
+    # End Region: Files
+    # ------------------
+
     @staticmethod
     def parseInputFile(file_name):
         """parseInputFile
@@ -24,20 +98,95 @@ class IOToolKit:
             _description_
         """
         orders_map=dict()
-        with open(file_name) as f:
-            data=f.read()
-        orders_container=data.splitlines()
-        
-        for order in orders_container:
-            order_map=json.loads(order)
-            id_order=order_map['order']['id']
-            orders_map.update({id_order:order_map})
+        with IOToolKit.openFile(file_name) as f:
+            for order in f:
+                if not order.strip():
+                    continue
+                order_map=json.loads(order)
+                id_order=order_map['order']['id']
+                orders_map.update({id_order:order_map})
         return orders_map
 
+    @staticmethod
+    def streamInputFile(file_name, decoder=None, blank_lines: bool = False) -> Iterator[HM]:
+        """streamInputFile
+        Description
+        -----------
+        Lazy counterpart of 'parseInputFile'. File is read line by line and every order is
+        yielded as soon as it is decoded, so memory does not depend on the length of the stream
+        and matching can start before the whole file is read.
+
+        Parameters
+        ----------
+        file_name : str
+            Path to the file with orders, one json per line, plain or compressed, see 'openFile'.
+        decoder : callable
+            Function that decodes single line, 'json.loads' by default.
+            'OrderDecoder.decodeOrder' gives order objects directly.
+        blank_lines : bool
+            If True then blank lines are passed to the decoder as well, so position in the stream is the line
+            number of the file, e.g. for 'BatchValidator'. Blank lines are skipped by default.
+
+        Yields
+        ------
+        HM
+            Single order in the input format, or whatever decoder returns.
+        """
+        decode = decoder if decoder is not None else json.loads
+        with IOToolKit.openFile(file_name) as f:
+            for line in f:
+                if blank_lines or line.strip():
+                    yield decode(line)
+
 
     @staticmethod
     def validateInputFiles(inputs_path,test_file):
         if not os.path.isfile(os.path.join(inputs_path,test_file)):
-            ValueError(f"There is no  test file {test_file}.")
+            raise ValueError(f"There is no  test file {test_file}.")
+
+    @staticmethod
+    def collectInputFiles(paths: Iterable[str], extension: str = ".in", compressed: bool = True) -> List[str]:
+        """collectInputFiles
+        Description
+        -----------
+        Expand files, directories and glob patterns into list of input files. Directory gives all its
+        files with 'extension', also compressed ones, e.g. '*.in.gz'. Every path is checked before anything is replayed, so a typo fails at once.
+
+        Parameters
+        ----------
+        paths : Iterable[str]
+            Files, directories or glob patterns, e.g. 'io/STREAM_FILES/*.in'.
+        extension : str
+            Extension of input files in directories.
+        compressed : bool
+            If False then compressed files are not input files, e.g. memory mapped binary streams,
+            directories give only plain files and compressed file given explicitly is refused.
+
+        Returns
+        -------
+        List[str]
+            Input files, sorted within every path, each file once.
+
+        Raises
+        ------
+        ValueError
+            If a path matches no input file or matches compressed file which is not allowed.
+        """
+        input_files = []
+        patterns = [extension] + ([extension + compression for compression in COMPRESSIONS] if compressed else [])
+        for path in paths:
+            if os.path.isdir(path):
+                matches = sorted(match for pattern in patterns
+                                 for match in glob.glob(os.path.join(glob.escape(path), "*" + pattern)))
+            elif os.path.isfile(path):
+                matches = [path]
+            else:
+                matches = sorted(match for match in glob.glob(path) if os.path.isfile(match))
+            if not matches:
+                raise ValueError(f"There is no input file matching {path}.")
+            if not compressed and any(IOToolKit.compressionOf(match) is not None for match in matches):
+                raise ValueError(f"Input {path} is compressed, only plain files can be read here.")
+            input_files.extend(matches)
+        return list(dict.fromkeys(input_files))
 
 
@@ -1,34 +1,76 @@
 from flash.python_tool_kit.IOToolKit import IOToolKit
-from flash.order_book.OrderProcessing import OrderBook,OrderHandler
-import os
+from flash.order_book.OutputWriter import OUTPUT_MODES
+from flash.order_book.TradeSink import TRADE_FORMATS
+from flash.order_book.Instrumentation import PROFILE_MODES
+from flash.order_book.FileReplay import FileReplay
+import argparse
 import sys
 
 
-# ------------------
-# Region: User customization
-# ------------------ 
-working_directory="/Users/krzysiekbienias/Documents/GitHub"
-test_name="test1"
-# ---------------------
-# Region: User customization
-# ---------------------
+parser=argparse.ArgumentParser(description="Replay stream of orders through the order book.")
+parser.add_argument("inputs",nargs="+",
+                    help="Stream files, directories or glob patterns, e.g. io/STREAM_FILES/test1.in. Every file is replayed "
+                         "in its own book in a pool of --jobs processes.")
+parser.add_argument("--output-dir",default=".",
+                    help="Directory of <name>.out of every input file and of summary.json.")
+parser.add_argument("--jobs",type=int,default=None,
+                    help="Number of processes replaying input files, number of cores by default.")
+parser.add_argument("--compress",choices=["gz","xz","bz2"],default=None,
+                    help="Write output files compressed, e.g. <name>.out.gz. Compressed inputs and trade logs "
+                         "are recognised by their extension.")
+parser.add_argument("--output-mode",choices=list(OUTPUT_MODES),default="snapshot",
+                    help="snapshot: full book after every order, delta: book changes and trades as they happen, "
+                         "periodic: full book every --snapshot-every orders.")
+parser.add_argument("--snapshot-every",type=int,default=1000,
+                    help="Number of orders between two snapshots in periodic mode.")
+parser.add_argument("--trade-log",default=None,
+                    help="File where trades are written as they happen, {name} is replaced by the name of the input file "
+                         "and is required with more inputs. By default trades are written at the end of the output file.")
+parser.add_argument("--trade-format",choices=list(TRADE_FORMATS),default="line",
+                    help="Format of the trade log.")
+parser.add_argument("--trade-batch",type=int,default=1,
+                    help="Number of trades written to the trade log at once.")
+parser.add_argument("--binary",action="store_true",
+                    help="Inputs are memory mapped binary streams, directories give their *.bin files.")
+parser.add_argument("--instrument",choices=["off","timers"]+list(PROFILE_MODES),default="off",
+                    help="timers: counters and latency histograms of parse, validate, match, book_update, emit and output stages, "
+                         "cprofile/tracemalloc: capture of the whole run.")
+parser.add_argument("--metrics-file",default=None,
+                    help="Destination of timers, cProfile stats or tracemalloc report, {name} is replaced by the name of "
+                         "the input file and is required with more inputs. Timers are printed if not given.")
+parser.add_argument("--metrics-format",choices=["json","prometheus"],default="json",
+                    help="Format of exported timers.")
+parser.add_argument("--journal-dir",default=None,
+                    help="Directory where accepted orders are journaled and the book is snapshotted, {name} is replaced "
+                         "by the name of the input file and is required with more inputs. Book is restored with "
+                         "'python -m flash.order_book.BookStore DIR'.")
+parser.add_argument("--journal-snapshot-every",type=int,default=100000,
+                    help="Number of events between two snapshots of the book.")
+parser.add_argument("--batch",type=int,default=None,
+                    help="Validate orders in batches of N with numpy, report every invalid order instead of stopping at the first one.")
+parser.add_argument("--workers",type=int,default=None,
+                    help="Run one book per symbol in N worker processes. Final book of every symbol and merged trades are written.")
+args=parser.parse_args()
 
-trade_flow_location="OrderBook/io/STREAM_FILES"
-orders_sequence_file=test_name+".in"
-IOToolKit.validateInputFiles(working_directory+'/'+trade_flow_location,test_file=orders_sequence_file)
-
-output_names=test_name+".out"
-output_stdout="OrderBook/io/OUTPUT_FILES"
-
-
-orders_gate_map=IOToolKit.parseInputFile(os.path.join(working_directory,trade_flow_location,orders_sequence_file))
-
-f=open(os.path.join(working_directory,output_stdout,output_names),"w")
-sys.stdout=f
-OrderBook(incoming_orders=orders_gate_map)
-f.close()
-
-
-
-    
+try:
+    input_files=IOToolKit.collectInputFiles(args.inputs,extension=".bin" if args.binary else ".in",compressed=not args.binary)
+    replay=FileReplay(args.output_dir,output_mode=args.output_mode,snapshot_every=args.snapshot_every,jobs=args.jobs,
+                      compression=None if args.compress is None else "."+args.compress,binary=args.binary,
+                      batch_size=args.batch,workers=args.workers,trade_log=args.trade_log,trade_format=args.trade_format,
+                      trade_batch=args.trade_batch,instrument=None if args.instrument=="off" else args.instrument,
+                      metrics_file=args.metrics_file,metrics_format=args.metrics_format,journal_directory=args.journal_dir,
+                      journal_snapshot_every=args.journal_snapshot_every)
+    summary=replay.run(input_files)
+except ValueError as e:
+    parser.error(str(e))
 
+for file in summary["files"]:
+    for rejected in file.get("rejected",[]):
+        print(f"{file['input']}: order in line {rejected['row']} rejected: {rejected['reason']}",file=sys.stderr)
+    if "metrics" in file:
+        print(file["metrics"])
+    status="ok" if file["error"] is None else file["error"]
+    print(f"{file['input']}: {file['orders']} orders, {file['trades']} trades, {file['wall_time_s']:.3f}s, {status}")
+print(f"{len(summary['files'])} files, {summary['orders']} orders, {summary['trades']} trades, "
+      f"{summary['failed']} failed, {summary['wall_time_s']:.3f}s")
+sys.exit(1 if summary["failed"] else 0)